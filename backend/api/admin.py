@@ -1,6 +1,66 @@
+from urllib.parse import parse_qsl
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, BankAccount, MutualFundScheme, Portfolio, MFTransaction
+from .models import (
+    User, BankAccount, MutualFundScheme, Portfolio, MFTransaction, HoldingValuation, Job,
+    NAVSnapshot, SchemeMetrics,
+)
+from .sharding import is_sharded, shard_aliases
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Picks which shard a sharded model's changelist reads; the first by default."""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def value(self):
+        value = super().value()
+        return value if value in shard_aliases() else shard_aliases()[0]
+
+    def choices(self, changelist):
+        # No "All": a changelist is one query, so it can only read one shard.
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == alias,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset.using(self.value())
+
+
+class ShardedModelAdmin(admin.ModelAdmin):
+    """
+    Admin for models whose rows live on the user's shard. The changelist
+    browses one shard at a time (see ShardFilter); the change page reads
+    the shard the changelist was on, which Django passes along in
+    _changelist_filters. Saves and deletes are routed by the row's user.
+    """
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return (ShardFilter, *list_filter) if is_sharded() else list_filter
+
+    def _shard(self, request):
+        shard = request.GET.get('shard')
+        if shard is None:
+            shard = dict(parse_qsl(request.GET.get('_changelist_filters', ''))).get('shard')
+        return shard if shard in shard_aliases() else shard_aliases()[0]
+
+    def get_object(self, request, object_id, from_field=None):
+        if not is_sharded():
+            return super().get_object(request, object_id, from_field)
+        queryset = self.get_queryset(request).using(self._shard(request))
+        field = self.model._meta.pk if from_field is None else self.model._meta.get_field(from_field)
+        try:
+            return queryset.get(**{field.name: field.to_python(object_id)})
+        except (self.model.DoesNotExist, ValueError):
+            return None
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -14,7 +74,7 @@ class UserAdmin(BaseUserAdmin):
     )
 
 @admin.register(BankAccount)
-class BankAccountAdmin(admin.ModelAdmin):
+class BankAccountAdmin(ShardedModelAdmin):
     list_display = ('user', 'account_number', 'bank_name', 'balance', 'created_at')
     search_fields = ('account_number', 'user__username', 'bank_name')
     list_filter = ('bank_name', 'created_at')
@@ -26,14 +86,39 @@ class MutualFundSchemeAdmin(admin.ModelAdmin):
     list_filter = ('category', 'is_active', 'created_at')
 
 @admin.register(Portfolio)
-class PortfolioAdmin(admin.ModelAdmin):
+class PortfolioAdmin(ShardedModelAdmin):
     list_display = ('user', 'scheme', 'units', 'invested_amount', 'updated_at')
     search_fields = ('user__username', 'scheme__name')
     list_filter = ('created_at', 'updated_at')
 
 @admin.register(MFTransaction)
-class MFTransactionAdmin(admin.ModelAdmin):
+class MFTransactionAdmin(ShardedModelAdmin):
     list_display = ('user', 'scheme', 'transaction_type', 'units', 'amount', 'transaction_date')
     search_fields = ('user__username', 'scheme__name')
     list_filter = ('transaction_type', 'transaction_date')
     readonly_fields = ('transaction_date',)
+
+@admin.register(HoldingValuation)
+class HoldingValuationAdmin(ShardedModelAdmin):
+    list_display = ('user', 'scheme', 'units', 'nav', 'current_value', 'profit_loss', 'valued_at')
+    search_fields = ('user__username', 'scheme__name')
+    list_filter = ('valued_at',)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at', 'created_by', 'finished_at')
+    search_fields = ('name', 'locked_by')
+    list_filter = ('status', 'name', 'created_at')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+@admin.register(NAVSnapshot)
+class NAVSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('scheme', 'date', 'nav')
+    search_fields = ('scheme__name', 'scheme__scheme_code')
+    list_filter = ('date',)
+
+@admin.register(SchemeMetrics)
+class SchemeMetricsAdmin(admin.ModelAdmin):
+    list_display = ('scheme', 'return_1y', 'return_3y', 'return_5y', 'volatility_1y', 'max_drawdown', 'as_of')
+    search_fields = ('scheme__name', 'scheme__scheme_code')
+    list_filter = ('as_of',)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .sharding import connect_replication
+        connect_replication()
+
+        # Registers the job handlers.
+        from . import tasks  # noqa: F401
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ChangeEvent, Portfolio
+
+logger = logging.getLogger(__name__)
+
+
+class EventHub:
+    """
+    In-process fan-out of change events to live stream subscribers.
+
+    Each subscriber is an asyncio queue bound to the event loop that serves
+    its connection, so idle connections cost a queue and nothing else.
+    dispatch() is thread-safe and may be called from sync views.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The loop has shut down; the subscriber is gone.
+                self.unsubscribe((loop, queue))
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+def _offer(queue, event):
+    # A client that stops reading loses events rather than growing memory;
+    # it gets a fresh snapshot when it reconnects.
+    if not queue.full():
+        queue.put_nowait(event)
+
+
+hub = EventHub()
+
+
+class ChangeFeedPoller(threading.Thread):
+    """
+    Tails the change_events table and feeds new rows into the local hub.
+
+    Used when EVENT_BACKEND is 'database' so that events published by any
+    worker process reach subscribers connected to this one.
+    """
+
+    def __init__(self, interval, window=None, batch_size=500):
+        super().__init__(name='change-feed-poller', daemon=True)
+        self.interval = interval
+        self.window = window or settings.EVENT_REPLAY_WINDOW
+        self.batch_size = batch_size
+        self.last_id = None
+        self.seen = set()
+        self.last_pruned = 0.0
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Change feed poll failed")
+                close_old_connections()
+            time.sleep(self.interval)
+
+    def poll(self):
+        if self.last_id is None:
+            # Start from the newest event; anything already in the window
+            # happened before this process started listening.
+            latest = ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first()
+            self.last_id = latest or 0
+            self.seen = set(
+                ChangeEvent.objects.filter(id__gt=self.last_id - self.window)
+                .values_list('id', flat=True)
+            )
+
+        # Re-read the trailing window so rows that committed after a higher
+        # id was already delivered are still picked up. Only ids are read
+        # for the window; payloads are fetched for the new rows alone.
+        window_ids = ChangeEvent.objects.filter(
+            id__gt=self.last_id - self.window
+        ).values_list('id', flat=True)
+        new_ids = sorted(set(window_ids) - self.seen)[:self.batch_size]
+        for row in ChangeEvent.objects.filter(id__in=new_ids).order_by('id'):
+            hub.dispatch({'type': row.kind, **row.payload})
+            self.seen.add(row.id)
+            self.last_id = max(self.last_id, row.id)
+
+        floor = self.last_id - self.window
+        self.seen = {event_id for event_id in self.seen if event_id > floor}
+
+        now = time.monotonic()
+        if now - self.last_pruned > 60:
+            cutoff = timezone.now() - timedelta(seconds=settings.EVENT_RETENTION)
+            ChangeEvent.objects.filter(created_at__lt=cutoff).delete()
+            self.last_pruned = now
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def ensure_feed():
+    """Start the database change feed poller once per process, if enabled."""
+    global _poller
+    if settings.EVENT_BACKEND != 'database' or _poller is not None:
+        return
+    with _poller_lock:
+        if _poller is None:
+            _poller = ChangeFeedPoller(settings.EVENT_POLL_INTERVAL)
+            _poller.start()
+
+
+def publish(kind, **payload):
+    """
+    Publish a change event once the current transaction commits.
+
+    With the 'memory' backend the event goes straight to this process's
+    hub; with 'database' it is written to the change feed and picked up by
+    the poller in every process.
+    """
+    if settings.EVENT_BACKEND == 'database':
+        ChangeEvent.objects.create(kind=kind, payload=payload)
+    else:
+        event = {'type': kind, **payload}
+        transaction.on_commit(lambda: hub.dispatch(event))
+
+
+def portfolio_totals(user_id):
+    """Recompute the user's portfolio totals with a single query."""
+    rows = Portfolio.objects.for_user(user_id).values_list(
+        'scheme_id', 'units', 'invested_amount', 'scheme__nav'
+    )
+    scheme_ids = []
+    total_invested = Decimal('0.00')
+    total_current_value = Decimal('0.00')
+    for scheme_id, units, invested, nav in rows:
+        scheme_ids.append(scheme_id)
+        total_invested += invested
+        total_current_value += units * nav
+
+    return set(scheme_ids), {
+        'total_invested': float(total_invested),
+        'total_current_value': float(total_current_value),
+        'total_profit_loss': float(total_current_value - total_invested),
+    }
+
+
+def _portfolio_totals_for_stream(user_id):
+    # Runs on an executor thread outside any request, so release the
+    # connection here instead of relying on the request_finished signal.
+    try:
+        return portfolio_totals(user_id)
+    finally:
+        close_old_connections()
+
+
+def _format(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_events(user_id):
+    """
+    Async generator producing the SSE stream for one user.
+
+    Sends a portfolio snapshot on connect, then every NAV change plus the
+    recomputed portfolio totals whenever a NAV the user holds changes or
+    the user makes a purchase. Streams close after EVENT_STREAM_MAX_AGE so
+    abandoned connections cannot pile up; EventSource reconnects on its own.
+    """
+    ensure_feed()
+    subscriber = hub.subscribe()
+    queue = subscriber[1]
+    deadline = time.monotonic() + settings.EVENT_STREAM_MAX_AGE
+    totals = sync_to_async(_portfolio_totals_for_stream, thread_sensitive=False)
+
+    try:
+        yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+        held, snapshot = await totals(user_id)
+        yield _format('portfolio', snapshot)
+
+        while time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.EVENT_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            if event['type'] == 'nav':
+                yield _format('nav', event)
+                if event['scheme_id'] not in held:
+                    continue
+            elif event['type'] != 'portfolio' or event['user_id'] != user_id:
+                continue
+
+            held, snapshot = await totals(user_id)
+            yield _format('portfolio', snapshot)
+    finally:
+        hub.unsubscribe(subscriber)
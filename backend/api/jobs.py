@@ -0,0 +1,226 @@
+"""
+Background jobs stored in the jobs table, no broker required.
+
+Workers claim the next due job with SELECT ... FOR UPDATE SKIP LOCKED, so
+any number of them can poll the same table without blocking each other.
+Handlers are plain functions registered by name (see api/tasks.py); a job's
+payload is passed to its handler as keyword arguments and whatever the
+handler returns is stored as the job's result.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def register(name):
+    """Decorator that makes a function runnable as job `name`."""
+    def decorator(fn):
+        HANDLERS[name] = fn
+        return fn
+    return decorator
+
+
+def enqueue(name, payload=None, priority=0, max_attempts=None, delay=0, created_by=None):
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown job: {name}")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        created_by=created_by,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker):
+    """Lock and return the next due job, or None if nothing is waiting."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='QUEUED', run_at__lte=now)
+            .order_by('-priority', 'run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        # The status check keeps this safe on databases that ignore row
+        # locks (SQLite): only one worker's update can match.
+        claimed = Job.objects.filter(pk=job.pk, status='QUEUED').update(
+            status='RUNNING', attempts=job.attempts + 1,
+            locked_by=worker, locked_at=now, started_at=now,
+        )
+        if not claimed:
+            return None
+    job.refresh_from_db()
+    return job
+
+
+def _retry_or_fail(job, error, now):
+    """Fields that hand a failed job back to the queue, or fail it for good."""
+    fields = {'error': error, 'locked_by': '', 'locked_at': None}
+    if job.attempts < job.max_attempts:
+        # Back off exponentially: 1x, 2x, 4x ... JOB_RETRY_BACKOFF seconds.
+        delay = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        fields.update(status='QUEUED', run_at=now + timedelta(seconds=delay))
+    else:
+        fields.update(status='FAILED', finished_at=now)
+    return fields
+
+
+class Heartbeat(threading.Thread):
+    """
+    Refreshes a running job's locked_at every `interval` seconds so that
+    requeue_stale() only picks up jobs whose worker has actually gone.
+    """
+
+    def __init__(self, job_id, worker, interval):
+        super().__init__(name=f'job-heartbeat-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    alive = Job.objects.filter(
+                        pk=self.job_id, status='RUNNING', locked_by=self.worker
+                    ).update(locked_at=timezone.now())
+                except DatabaseError:
+                    # Try again next beat; one missed beat is well inside
+                    # JOB_LOCK_TIMEOUT.
+                    continue
+                if not alive:
+                    # The job was requeued under us; its final write will
+                    # be discarded, so there is nothing left to keep alive.
+                    break
+        finally:
+            # This thread has its own connection.
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its result or schedule a retry. Returns
+    False if the job was taken away from this worker while it ran, in
+    which case nothing is written.
+    """
+    worker = job.locked_by
+    heartbeat = Heartbeat(job.pk, worker, settings.JOB_HEARTBEAT_INTERVAL)
+    heartbeat.start()
+    try:
+        handler = HANDLERS[job.name]
+        result = handler(**job.payload)
+    except Exception:
+        fields = _retry_or_fail(job, traceback.format_exc(), timezone.now())
+    else:
+        fields = {
+            'status': 'SUCCEEDED', 'result': result, 'error': '',
+            'locked_by': '', 'locked_at': None, 'finished_at': timezone.now(),
+        }
+    finally:
+        heartbeat.stop()
+
+    # Only the worker that still holds the lock may record the outcome.
+    owned = Job.objects.filter(pk=job.pk, status='RUNNING', locked_by=worker)
+    try:
+        # The savepoint keeps a failed write from poisoning an enclosing
+        # transaction, so the fallback below can still be recorded.
+        with transaction.atomic():
+            return bool(owned.update(**fields))
+    except Exception:
+        # e.g. a result that isn't JSON-serialisable or a dropped
+        # connection: record a failed attempt instead of killing the worker.
+        fields = _retry_or_fail(job, traceback.format_exc(), timezone.now())
+    try:
+        return bool(owned.update(**fields))
+    except DatabaseError:
+        # The database is unreachable; the stale sweep requeues the job.
+        logger.exception("Could not record the outcome of job %s", job.pk)
+        return False
+
+
+def requeue_stale():
+    """
+    Give jobs back whose worker died mid-run: RUNNING jobs whose lock has
+    not been refreshed for JOB_LOCK_TIMEOUT seconds.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        stale = Job.objects.select_for_update(skip_locked=True).filter(
+            status='RUNNING', locked_at__lt=cutoff
+        )
+        for job in stale:
+            # Matching on locked_at skips a job whose heartbeat landed
+            # after it was read.
+            Job.objects.filter(
+                pk=job.pk, status='RUNNING', locked_by=job.locked_by, locked_at=job.locked_at
+            ).update(**_retry_or_fail(job, f"Worker {job.locked_by} stopped responding.", now))
+
+
+def work(burst=False, max_jobs=None, poll_interval=None):
+    """
+    Claim and run jobs until stopped by a signal. With burst=True the loop
+    exits as soon as the queue is empty. Returns the number of jobs run.
+    """
+    worker = worker_name()
+    poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+    processed = 0
+    last_sweep = 0.0
+
+    # On Ctrl-C / SIGTERM finish the current job, then stop.
+    stopping = []
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: stopping.append(signum))
+
+    while not stopping and (max_jobs is None or processed < max_jobs):
+        close_old_connections()
+        if time.monotonic() - last_sweep > poll_interval * 60:
+            requeue_stale()
+            last_sweep = time.monotonic()
+
+        try:
+            job = claim(worker)
+        except DatabaseError:
+            # e.g. a dropped connection or SQLite's "database is locked";
+            # nothing was claimed, so just try again after a pause.
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        run_job(job)
+        processed += 1
+
+    return processed
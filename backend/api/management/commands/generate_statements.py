@@ -0,0 +1,57 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.statements import FORMATS, generate_statements
+
+
+def _previous_month():
+    first_of_month = timezone.localdate().replace(day=1)
+    end = first_of_month - timedelta(days=1)
+    return end.replace(day=1), end
+
+
+class Command(BaseCommand):
+    help = (
+        "Render per-customer account statements to disk. Re-running with the "
+        "same period, format and --chunk-size resumes an interrupted run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir')
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help="First day of the period (defaults to last month).")
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help="Last day of the period (defaults to last month).")
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (defaults to the CPU count).")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Width of each user id range handed to a worker.")
+
+    def handle(self, *args, **options):
+        start, end = _previous_month()
+        start = options['start'] or start
+        end = options['end'] or end
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        def progress(done, total, written):
+            self.stdout.write(f"[{done}/{total}] ranges done, {written} statements written")
+
+        started = time.monotonic()
+        written, skipped = generate_statements(
+            options['output_dir'], start, end,
+            fmt=options['format'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} statements for {start} to {end} in {elapsed:.1f}s "
+            f"({skipped} ranges already done)."
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.onboarding import COLUMNS, CustomerImportError, import_customers
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create customers with bank accounts and opening holdings from a CSV "
+        f"with the columns: {', '.join(COLUMNS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--errors', default=None,
+                            help="Write rejected rows to this CSV (defaults to <path>.errors.csv).")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Password hashing processes (defaults to the CPU count).")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Rows checked, hashed and written per batch.")
+
+    def handle(self, *args, **options):
+        errors_path = options['errors'] or f"{options['path']}.errors.csv"
+
+        def progress(report):
+            rate = report['rows'] / report['seconds'] if report['seconds'] else 0
+            self.stdout.write(
+                f"{report['rows']} rows: {report['created']} created, "
+                f"{report['failed']} failed ({rate:.0f} rows/s)"
+            )
+
+        try:
+            report, errors = import_customers(
+                options['path'],
+                errors_path=errors_path,
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                progress=progress,
+            )
+        except (OSError, CustomerImportError) as exc:
+            raise CommandError(str(exc))
+
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Imported {report['created']} of {report['rows']} customers with "
+            f"{report['holdings']} holdings in {report['seconds']}s "
+            f"({report['rows_per_second']} rows/s); {report['failed']} rows failed."
+            + (f" Errors: {errors_path}" if errors else "")
+        ))
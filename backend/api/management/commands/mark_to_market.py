@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.valuation import mark_to_market, verify_valuations
+
+
+class Command(BaseCommand):
+    help = "Revalue every holding at current NAVs into the holding_valuations table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                            help="Portfolios loaded and valued per batch.")
+        parser.add_argument('--verify', action='store_true',
+                            help="Afterwards, check every result against the Decimal model methods.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        valued = mark_to_market(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Valued {valued} holdings in {elapsed:.1f}s."))
+
+        if options['verify']:
+            checked, mismatches = verify_valuations()
+            if mismatches:
+                raise CommandError(
+                    f"{len(mismatches)} of {checked} valuations differ from Decimal results "
+                    f"(shard, portfolio id: {mismatches[:20]})"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Verified {checked} valuations against Decimal results."))
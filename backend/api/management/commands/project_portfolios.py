@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.projections import project_all
+
+
+class Command(BaseCommand):
+    help = "Run Monte Carlo projections for every portfolio and cache the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--paths', type=int, default=settings.PROJECTION_DEFAULT_PATHS)
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (defaults to the CPU count).")
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help="Users sent to a worker per task.")
+
+    def handle(self, *args, **options):
+        years = options['years']
+        paths = options['paths']
+        if not 5 <= years <= 20:
+            raise CommandError("--years must be between 5 and 20.")
+        if not settings.PROJECTION_DEFAULT_PATHS <= paths <= settings.PROJECTION_MAX_PATHS:
+            raise CommandError(
+                f"--paths must be between {settings.PROJECTION_DEFAULT_PATHS} "
+                f"and {settings.PROJECTION_MAX_PATHS}."
+            )
+
+        started = time.monotonic()
+        projected, skipped = project_all(
+            years, paths, workers=options['workers'], chunk_size=options['chunk_size']
+        )
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Projected {projected} portfolios ({skipped} unchanged, served from cache) "
+            f"in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,20 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api.screener import refresh_scheme_metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute trailing returns, volatility and drawdown for every scheme from its NAV history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                            help="Compute figures as of this date (defaults to today).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = refresh_scheme_metrics(options['as_of'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Refreshed metrics for {written} schemes in {elapsed:.2f}s."))
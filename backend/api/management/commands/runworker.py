@@ -0,0 +1,64 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import HANDLERS, work
+from api.pool import start_process
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs from the jobs table. Ctrl-C or SIGTERM lets "
+        "every worker finish its current job before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="Worker processes, each running one job at a time.")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once the queue is empty instead of polling.")
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help="Stop each worker after this many jobs.")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds to wait when the queue is empty (defaults to JOB_POLL_INTERVAL).")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        kwargs = {
+            'burst': options['burst'],
+            'max_jobs': options['max_jobs'],
+            'poll_interval': options['poll_interval'],
+        }
+
+        self.stdout.write(f"Starting {concurrency} worker(s) for: {', '.join(sorted(HANDLERS))}")
+        started = time.monotonic()
+        if concurrency == 1:
+            processed = work(**kwargs)
+            self.stdout.write(self.style.SUCCESS(
+                f"Ran {processed} jobs in {time.monotonic() - started:.1f}s."
+            ))
+            return
+
+        workers = [start_process('api.jobs.work', **kwargs) for _ in range(concurrency)]
+
+        def stop(signum, frame):
+            # Pass the signal on; each worker stops after its current job.
+            self.stdout.write("Stopping after the running jobs finish...")
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        for process in workers:
+            process.join()
+
+        failed = sum(1 for process in workers if process.exitcode)
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{concurrency} workers stopped after {time.monotonic() - started:.1f}s"
+            + (f"; {failed} exited with an error." if failed else ".")
+        ))
@@ -1,4 +1,7 @@
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+
+from .sharding import shard_for_user
 
 class UserManager(BaseUserManager):
     def create_user(self, username, password=None, **extra_fields):
@@ -20,3 +23,23 @@ class UserManager(BaseUserManager):
             raise ValueError("Superuser must have role ADMIN")
 
         return self.create_user(username, password, **extra_fields)
+
+
+class ShardedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Rows belonging to one user, read from that user's shard."""
+        user_id = getattr(user, 'pk', user)
+        return self.using(shard_for_user(user_id)).filter(user_id=user_id)
+
+    def create(self, **kwargs):
+        # A plain Model.objects.create() has no instance to route by, so
+        # pick the shard from the user being written.
+        if self._db is None:
+            user = kwargs.get('user')
+            user_id = kwargs.get('user_id', getattr(user, 'pk', None))
+            if user_id is not None:
+                return super(ShardedQuerySet, self.using(shard_for_user(user_id))).create(**kwargs)
+        return super().create(**kwargs)
+
+
+ShardedManager = models.Manager.from_queryset(ShardedQuerySet)
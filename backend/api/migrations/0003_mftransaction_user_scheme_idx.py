@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_changeevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mftransaction',
+            index=models.Index(fields=['user', 'scheme'], name='mf_txn_user_scheme_idx'),
+        ),
+    ]
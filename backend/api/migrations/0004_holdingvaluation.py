@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_mftransaction_user_scheme_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoldingValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('nav', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('current_value', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('profit_loss', models.DecimalField(decimal_places=8, max_digits=24)),
+                ('valued_at', models.DateTimeField(db_index=True)),
+                ('portfolio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='valuation', to='api.portfolio')),
+                ('scheme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to='api.mutualfundscheme')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'holding_valuations',
+            },
+        ),
+    ]
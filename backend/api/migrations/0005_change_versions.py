@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_holdingvaluation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mftransaction',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='change_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='mftransaction',
+            index=models.Index(fields=['user', 'version'], name='mf_txn_user_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['user', 'version'], name='portfolio_user_version_idx'),
+        ),
+    ]
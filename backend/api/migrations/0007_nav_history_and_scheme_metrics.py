@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_nav_history(apps, schema_editor):
+    # Start every existing scheme's history at its current NAV.
+    MutualFundScheme = apps.get_model('api', 'MutualFundScheme')
+    NAVSnapshot = apps.get_model('api', 'NAVSnapshot')
+    db = schema_editor.connection.alias
+    NAVSnapshot.objects.using(db).bulk_create([
+        NAVSnapshot(scheme_id=scheme_id, date=updated_at.date(), nav=nav)
+        for scheme_id, nav, updated_at in
+        MutualFundScheme.objects.using(db).values_list('id', 'nav', 'updated_at')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchemeMetrics',
+            fields=[
+                ('scheme', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='metrics', serialize=False, to='api.mutualfundscheme')),
+                ('return_1y', models.FloatField(db_index=True, null=True)),
+                ('return_3y', models.FloatField(db_index=True, null=True)),
+                ('return_5y', models.FloatField(db_index=True, null=True)),
+                ('volatility_1y', models.FloatField(db_index=True, null=True)),
+                ('max_drawdown', models.FloatField(db_index=True, null=True)),
+                ('as_of', models.DateField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'scheme_metrics',
+            },
+        ),
+        migrations.CreateModel(
+            name='NAVSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nav', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('scheme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nav_history', to='api.mutualfundscheme')),
+            ],
+            options={
+                'db_table': 'nav_snapshots',
+                'ordering': ['scheme', 'date'],
+                'unique_together': {('scheme', 'date')},
+            },
+        ),
+        migrations.RunPython(seed_nav_history, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,8 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from .managers import ShardedManager
+
 # 1. Custom User Model
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -11,6 +13,9 @@ class User(AbstractUser):
     ]
 
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='CUSTOMER')
+    # Bumped whenever the user's portfolio or transactions change, so
+    # clients can ask for "changes since" the version they last saw.
+    change_version = models.PositiveBigIntegerField(default=0)
    
 
     def __str__(self):
@@ -35,6 +40,8 @@ class BankAccount(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     def __str__(self):
         return f"{self.user.username} - {self.bank_name}"
 
@@ -80,9 +87,12 @@ class Portfolio(models.Model):
         default=Decimal('0.00'),
         validators=[MinValueValidator(Decimal('0.00'))]
     )
+    version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     def current_value(self):
         return self.units * self.scheme.nav
 
@@ -95,6 +105,9 @@ class Portfolio(models.Model):
     class Meta:
         db_table = 'portfolios'
         unique_together = ('user', 'scheme')
+        indexes = [
+            models.Index(fields=['user', 'version'], name='portfolio_user_version_idx'),
+        ]
 
 
 # 5. Transaction Model (Tracks History)
@@ -110,11 +123,128 @@ class MFTransaction(models.Model):
     units = models.DecimalField(max_digits=12, decimal_places=4)
     nav_at_transaction = models.DecimalField(max_digits=10, decimal_places=4)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+    version = models.PositiveBigIntegerField(default=0)
     transaction_date = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedManager()
+
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} {self.units} units of {self.scheme.name}"
 
     class Meta:
         db_table = 'mf_transactions'
-        ordering = ['-transaction_date']
\ No newline at end of file
+        ordering = ['-transaction_date']
+        indexes = [
+            # Reconciliation aggregates the ledger per (user, scheme).
+            models.Index(fields=['user', 'scheme'], name='mf_txn_user_scheme_idx'),
+            models.Index(fields=['user', 'version'], name='mf_txn_user_version_idx'),
+        ]
+
+# 6. Change Event Model (DB-backed feed for the live event stream)
+class ChangeEvent(models.Model):
+    kind = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+    class Meta:
+        db_table = 'change_events'
+        ordering = ['id']
+
+
+# 7. Holding Valuation Model (latest mark-to-market per portfolio)
+class HoldingValuation(models.Model):
+    portfolio = models.OneToOneField(Portfolio, on_delete=models.CASCADE, related_name='valuation')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='valuations')
+    scheme = models.ForeignKey(MutualFundScheme, on_delete=models.CASCADE, related_name='valuations')
+    units = models.DecimalField(max_digits=12, decimal_places=4)
+    nav = models.DecimalField(max_digits=10, decimal_places=4)
+    # units * nav is exact at 8 decimal places, so no rounding is applied.
+    current_value = models.DecimalField(max_digits=24, decimal_places=8)
+    profit_loss = models.DecimalField(max_digits=24, decimal_places=8)
+    valued_at = models.DateTimeField(db_index=True)
+
+    objects = ShardedManager()
+
+    def __str__(self):
+        return f"{self.portfolio} @ {self.nav} = {self.current_value}"
+
+    class Meta:
+        db_table = 'holding_valuations'
+
+
+# 8. Job Model (database-backed background job queue)
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    )
+
+    name = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    # Higher priorities are claimed first.
+    priority = models.SmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_claim_idx'),
+        ]
+
+
+# 9. NAV Snapshot Model (NAV history, one row per scheme per day)
+class NAVSnapshot(models.Model):
+    scheme = models.ForeignKey(MutualFundScheme, on_delete=models.CASCADE, related_name='nav_history')
+    date = models.DateField()
+    nav = models.DecimalField(max_digits=10, decimal_places=4)
+
+    def __str__(self):
+        return f"{self.scheme.scheme_code} {self.date}: {self.nav}"
+
+    class Meta:
+        db_table = 'nav_snapshots'
+        ordering = ['scheme', 'date']
+        unique_together = ['scheme', 'date']
+
+
+# 10. Scheme Metrics Model (screener figures, rebuilt by refresh_scheme_metrics)
+class SchemeMetrics(models.Model):
+    scheme = models.OneToOneField(
+        MutualFundScheme, on_delete=models.CASCADE, primary_key=True, related_name='metrics'
+    )
+    # Trailing CAGR in percent; null when the history is too short.
+    return_1y = models.FloatField(null=True, db_index=True)
+    return_3y = models.FloatField(null=True, db_index=True)
+    return_5y = models.FloatField(null=True, db_index=True)
+    # Annualised volatility over the last year and worst peak-to-trough
+    # fall (negative) over the whole window, both in percent.
+    volatility_1y = models.FloatField(null=True, db_index=True)
+    max_drawdown = models.FloatField(null=True, db_index=True)
+    as_of = models.DateField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Metrics for {self.scheme} as of {self.as_of}"
+
+    class Meta:
+        db_table = 'scheme_metrics'
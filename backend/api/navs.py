@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish
+from .jobs import enqueue
+from .models import NAVSnapshot
+
+# Ahead of batch work such as statements, so holders catch up quickly.
+BUMP_PRIORITY = 10
+
+
+def record_snapshot(scheme):
+    """Store the scheme's current NAV as today's point in its NAV history."""
+    NAVSnapshot.objects.update_or_create(
+        scheme=scheme, date=timezone.localdate(), defaults={'nav': scheme.nav}
+    )
+
+
+def set_nav(scheme, nav):
+    """
+    Save a scheme's new NAV, queue the re-stamp of its holders and notify
+    listeners.
+
+    Re-stamping touches every holder of the scheme, so it runs as a job
+    rather than inside the caller's request. The job is queued in the same
+    transaction as the NAV, so a committed NAV change always gets its bump.
+    Until a worker has run it, delta sync and the cached dashboard totals
+    for holders still reflect the previous NAV; the live stream doesn't.
+    """
+    with transaction.atomic():
+        scheme.nav = nav
+        scheme.save()
+        record_snapshot(scheme)
+        enqueue('bump_scheme_holders', {'scheme_id': scheme.id}, priority=BUMP_PRIORITY)
+    publish('nav', scheme_id=scheme.id, nav=str(scheme.nav),
+            updated_at=scheme.updated_at.isoformat())
+    return scheme
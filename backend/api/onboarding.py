@@ -0,0 +1,347 @@
+"""
+Bulk customer import from CSV.
+
+One row per customer with the columns in COLUMNS. `password` may be left
+blank, in which case the account gets an unusable password and the
+customer has to reset it. `holdings` lists opening positions as
+semicolon-separated SCHEME_CODE:UNITS:INVESTED entries, e.g.
+"EQ01:125.5000:2500.00;DB02:40:4200.50".
+
+The file is streamed in chunks. Rows are checked in the parent, and
+password validation and hashing (the slow part) run in a process pool one
+chunk ahead of the writes. Each chunk's users, bank accounts, portfolios
+and opening BUY transactions are then written with bulk_create in one
+transaction per database, so a chunk either lands completely or not at all.
+Rows that fail are reported with their line number and don't stop the run.
+"""
+import csv
+import time
+from contextlib import ExitStack
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import BankAccount, MutualFundScheme, Portfolio, MFTransaction
+from .pool import process_pool, chunked
+from .sharding import shard_aliases, shard_for_user
+
+User = get_user_model()
+
+COLUMNS = (
+    'username', 'email', 'first_name', 'last_name', 'password',
+    'account_number', 'ifsc_code', 'bank_name', 'balance', 'holdings',
+)
+REQUIRED = ('username', 'email', 'first_name', 'last_name', 'account_number', 'ifsc_code', 'bank_name')
+MAX_LENGTHS = {'username': 150, 'email': 254, 'first_name': 150, 'last_name': 150,
+               'account_number': 20, 'ifsc_code': 11, 'bank_name': 100}
+# Rows per worker task when hashing passwords.
+HASH_BATCH_SIZE = 200
+
+
+class CustomerImportError(Exception):
+    """The file itself can't be imported (e.g. missing columns)."""
+
+
+def _fits(number, max_digits, places, field):
+    # Same limit as DecimalField(max_digits, places), checked per row so an
+    # oversized value fails its own row instead of the whole chunk's insert.
+    if number >= Decimal(10) ** (max_digits - places):
+        raise ValueError(f"{field} must be less than {Decimal(10) ** (max_digits - places):,}.")
+    return number
+
+
+def _decimal(value, max_digits, places, field):
+    try:
+        number = Decimal(value or '0')
+    except InvalidOperation:
+        raise ValueError(f"{field} is not a number.")
+    if not number.is_finite() or number < 0:
+        raise ValueError(f"{field} must be zero or more.")
+    if number.as_tuple().exponent < -places:
+        raise ValueError(f"{field} has more than {places} decimal places.")
+    return _fits(number.quantize(Decimal(1).scaleb(-places)), max_digits, places, field)
+
+
+def parse_holdings(value, schemes):
+    """Parse the holdings column into (scheme_id, units, invested, cost_nav) tuples."""
+    holdings = []
+    seen = set()
+    for entry in filter(None, (part.strip() for part in (value or '').split(';'))):
+        try:
+            code, units, invested = (part.strip() for part in entry.split(':'))
+        except ValueError:
+            raise ValueError(f"Holding '{entry}' should be SCHEME_CODE:UNITS:INVESTED.")
+        scheme_id = schemes.get(code)
+        if scheme_id is None:
+            raise ValueError(f"Unknown scheme code '{code}'.")
+        if scheme_id in seen:
+            raise ValueError(f"Scheme '{code}' is listed twice.")
+        seen.add(scheme_id)
+        units = _decimal(units, 12, 4, 'units')
+        if units == 0:
+            raise ValueError(f"Holding '{entry}' has no units.")
+        invested = _decimal(invested, 12, 2, 'invested')
+        # The opening position's cost per unit, stored as the BUY's NAV.
+        cost_nav = _fits((invested / units).quantize(Decimal('0.0001')), 10, 4, f"NAV implied by '{entry}'")
+        holdings.append((scheme_id, units, invested, cost_nav))
+    return holdings
+
+
+def check_row(row, schemes):
+    """Field-level checks that need no database access; returns the cleaned row."""
+    cleaned = {column: (row.get(column) or '').strip() for column in COLUMNS}
+    cleaned['password'] = row.get('password') or ''
+    for column in REQUIRED:
+        if not cleaned[column]:
+            raise ValueError(f"{column} is required.")
+    for column, limit in MAX_LENGTHS.items():
+        if len(cleaned[column]) > limit:
+            raise ValueError(f"{column} is longer than {limit} characters.")
+    try:
+        User.username_validator(cleaned['username'])
+        validate_email(cleaned['email'])
+    except ValidationError as exc:
+        raise ValueError(' '.join(exc.messages))
+    cleaned['balance'] = _decimal(cleaned['balance'], 12, 2, 'balance')
+    cleaned['holdings'] = parse_holdings(cleaned['holdings'], schemes)
+    return cleaned
+
+
+def hash_passwords(rows):
+    """
+    Validate and hash passwords for (line, username, email, first_name,
+    last_name, password) tuples. Runs in a pool worker; returns
+    (line, hash, error) tuples.
+    """
+    results = []
+    for line, username, email, first_name, last_name, password in rows:
+        if not password:
+            results.append((line, make_password(None), None))
+            continue
+        try:
+            validate_password(password, User(username=username, email=email,
+                                             first_name=first_name, last_name=last_name))
+        except ValidationError as exc:
+            results.append((line, None, ' '.join(exc.messages)))
+            continue
+        results.append((line, make_password(password), None))
+    return results
+
+
+def _existing(model, field, values, aliases):
+    taken = set()
+    for alias in aliases:
+        for start in range(0, len(values), 1000):
+            taken.update(
+                model._base_manager.using(alias)
+                .filter(**{f'{field}__in': values[start:start + 1000]})
+                .values_list(field, flat=True)
+            )
+    return taken
+
+
+class _Importer:
+    def __init__(self, chunk_size, progress):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.schemes = dict(MutualFundScheme.objects.values_list('scheme_code', 'id'))
+        # Usernames and account numbers saved from earlier chunks. Values of
+        # a chunk still being written are added once its write succeeds.
+        self.seen_usernames = set()
+        self.seen_accounts = set()
+        self.report = {'rows': 0, 'created': 0, 'holdings': 0, 'failed': 0}
+        self.errors = []
+
+    def fail(self, line, username, message):
+        self.report['failed'] += 1
+        self.errors.append({'line': line, 'username': username, 'error': message})
+
+    def check_chunk(self, chunk):
+        """Run row checks and uniqueness checks for one chunk of (line, row)."""
+        valid = []
+        for line, row in chunk:
+            self.report['rows'] += 1
+            try:
+                valid.append((line, check_row(row, self.schemes)))
+            except ValueError as exc:
+                self.fail(line, (row.get('username') or '').strip(), str(exc))
+
+        taken_usernames = _existing(User, 'username', [r['username'] for _l, r in valid], ['default'])
+        taken_accounts = _existing(
+            BankAccount, 'account_number', [r['account_number'] for _l, r in valid], shard_aliases()
+        )
+        # Rows that clash only with the chunk still being written pass here;
+        # write_chunk rejects them once that chunk is known to be saved.
+        chunk_usernames, chunk_accounts = set(), set()
+        unique = []
+        for line, row in valid:
+            username, account = row['username'], row['account_number']
+            if username in taken_usernames or username in self.seen_usernames or username in chunk_usernames:
+                self.fail(line, username, "A user with that username already exists.")
+            elif account in taken_accounts or account in self.seen_accounts or account in chunk_accounts:
+                self.fail(line, username, "That account number is already linked.")
+            else:
+                chunk_usernames.add(username)
+                chunk_accounts.add(account)
+                unique.append((line, row))
+        return unique
+
+    def submit_hashes(self, pool, rows):
+        jobs = [
+            (line, r['username'], r['email'], r['first_name'], r['last_name'], r['password'])
+            for line, r in rows
+        ]
+        return [pool.submit(hash_passwords, batch) for batch in chunked(jobs, HASH_BATCH_SIZE)]
+
+    def write_chunk(self, rows, futures):
+        hashes = {}
+        for future in futures:
+            for line, password_hash, error in future.result():
+                hashes[line] = (password_hash, error)
+
+        ready = []
+        for line, row in rows:
+            password_hash, error = hashes[line]
+            if error:
+                self.fail(line, row['username'], error)
+            elif row['username'] in self.seen_usernames:
+                self.fail(line, row['username'], "A user with that username already exists.")
+            elif row['account_number'] in self.seen_accounts:
+                self.fail(line, row['username'], "That account number is already linked.")
+            else:
+                ready.append((line, row, password_hash))
+        if not ready:
+            return
+
+        try:
+            self._write(ready)
+        except DatabaseError as exc:
+            # Usually a username or account number taken by someone else
+            # since the chunk was checked; nothing from this chunk was saved.
+            for line, row, _hash in ready:
+                self.fail(line, row['username'], f"Chunk not saved: {exc}")
+            return
+        self.seen_usernames.update(row['username'] for _l, row, _h in ready)
+        self.seen_accounts.update(row['account_number'] for _l, row, _h in ready)
+        self.report['created'] += len(ready)
+        self.report['holdings'] += sum(len(row['holdings']) for _l, row, _h in ready)
+
+    def _write(self, ready):
+        now = timezone.now()
+        users = [
+            User(
+                username=row['username'], email=row['email'],
+                first_name=row['first_name'], last_name=row['last_name'],
+                password=password_hash, role='CUSTOMER', date_joined=now,
+                # New rows below are stamped with version 1 for delta sync.
+                change_version=1,
+            )
+            for _line, row, password_hash in ready
+        ]
+
+        # Hold every database's transaction open until all writes are done,
+        # so a failure on one shard rolls back the users and other shards too.
+        with ExitStack() as stack:
+            stack.enter_context(transaction.atomic())
+            User.objects.bulk_create(users)
+
+            by_shard = {}
+            for user, (_line, row, _hash) in zip(users, ready):
+                by_shard.setdefault(shard_for_user(user.pk), []).append((user, row))
+            for alias, members in by_shard.items():
+                if alias != 'default':
+                    stack.enter_context(transaction.atomic(using=alias))
+                self._write_shard(alias, members)
+
+    def _write_shard(self, alias, members):
+        if alias != 'default':
+            # bulk_create sends no post_save, so copy the users to their
+            # shard here (see sharding._replicate_user).
+            User.objects.using(alias).bulk_create([
+                User(**{f.attname: getattr(user, f.attname) for f in User._meta.concrete_fields})
+                for user, _row in members
+            ])
+
+        accounts, portfolios, transactions = [], [], []
+        for user, row in members:
+            accounts.append(BankAccount(
+                user_id=user.pk, account_number=row['account_number'],
+                ifsc_code=row['ifsc_code'], bank_name=row['bank_name'], balance=row['balance'],
+            ))
+            for scheme_id, units, invested, cost_nav in row['holdings']:
+                portfolios.append(Portfolio(
+                    user_id=user.pk, scheme_id=scheme_id, units=units,
+                    invested_amount=invested, version=1,
+                ))
+                transactions.append(MFTransaction(
+                    user_id=user.pk, scheme_id=scheme_id, transaction_type='BUY',
+                    units=units, amount=invested, version=1,
+                    # The opening position's cost per unit, not today's NAV.
+                    nav_at_transaction=cost_nav,
+                ))
+
+        BankAccount.objects.using(alias).bulk_create(accounts, batch_size=1000)
+        Portfolio.objects.using(alias).bulk_create(portfolios, batch_size=1000)
+        MFTransaction.objects.using(alias).bulk_create(transactions, batch_size=1000)
+
+    def run(self, rows, workers):
+        started = time.monotonic()
+
+        with process_pool(workers) as pool:
+            # Keep one chunk hashing in the pool while the previous one is
+            # written, so the database and the CPUs are busy at once.
+            pending = None
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                checked = self.check_chunk(chunk)
+                submitted = (checked, self.submit_hashes(pool, checked))
+                if pending:
+                    self.write_chunk(*pending)
+                    self._progress(started)
+                pending = submitted
+            if pending:
+                self.write_chunk(*pending)
+                self._progress(started)
+
+        elapsed = time.monotonic() - started
+        # Rows rejected while hashing are found a chunk later than the rest.
+        self.errors.sort(key=lambda error: error['line'])
+        self.report['seconds'] = round(elapsed, 2)
+        self.report['rows_per_second'] = round(self.report['rows'] / elapsed, 1) if elapsed else None
+        return self.report, self.errors
+
+    def _progress(self, started):
+        if self.progress:
+            self.progress(dict(self.report, seconds=round(time.monotonic() - started, 2)))
+
+
+def import_customers(path, errors_path=None, workers=None, chunk_size=2000, progress=None):
+    """
+    Import customers from the CSV at `path`. Returns (report, errors): a
+    dict of counts and throughput, and a list of per-row error dicts, which
+    are also written to `errors_path` as CSV when given.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in REQUIRED if column not in (reader.fieldnames or [])]
+        if missing:
+            raise CustomerImportError(f"Missing columns: {', '.join(missing)}.")
+        # Line numbers as shown in an editor; the header is line 1.
+        rows = ((reader.line_num, row) for row in reader)
+        report, errors = _Importer(chunk_size, progress).run(rows, workers)
+
+    if errors_path:
+        with open(errors_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['line', 'username', 'error'])
+            writer.writeheader()
+            writer.writerows(errors)
+    return report, errors
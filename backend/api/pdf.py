@@ -0,0 +1,68 @@
+"""
+Minimal text-only PDF writer for account statements.
+
+Statements are monospaced tables, so a single built-in Courier font is
+all that's needed and no PDF library has to be installed.
+"""
+
+FONT_SIZE = 9
+LEADING = 12
+PAGE_WIDTH = 595   # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 40
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+
+def _escape(text):
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.encode('latin-1', 'replace')
+
+
+def _page_stream(lines):
+    parts = [b'BT', f'/F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode()]
+    for line in lines:
+        parts.append(b'(' + _escape(line) + b") '")
+    parts.append(b'ET')
+    return b'\n'.join(parts)
+
+
+def render_text_pdf(lines):
+    """Lay out lines of text on as many A4 pages as needed and return PDF bytes."""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then a page and a
+    # content stream per page.
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for page_lines in pages:
+        stream = _page_stream(page_lines)
+        page_num = len(objects) + 1
+        kids.append(f'{page_num} 0 R')
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_num + 1} 0 R >>'.encode()
+        )
+        objects.append(
+            f'<< /Length {len(stream)} >>\nstream\n'.encode() + stream + b'\nendstream'
+        )
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{num} 0 obj\n'.encode() + body + b'\nendobj\n'
+
+    xref_at = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    for offset in offsets:
+        out += f'{offset:010d} 00000 n \n'.encode()
+    out += (
+        f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'
+        f'startxref\n{xref_at}\n%%EOF\n'
+    ).encode()
+    return bytes(out)
@@ -0,0 +1,60 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+
+def _init_worker(settings_module):
+    # Spawned workers start from a clean interpreter, so Django has to be
+    # configured again before any model can be imported.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    import django
+    django.setup()
+
+
+def _settings_module():
+    return os.environ.get('DJANGO_SETTINGS_MODULE', 'mutual_fund_system.settings')
+
+
+def _run_in_worker(settings_module, path, args, kwargs):
+    _init_worker(settings_module)
+    from django.utils.module_loading import import_string
+    return import_string(path)(*args, **kwargs)
+
+
+def start_process(path, *args, **kwargs):
+    """
+    Start the function at dotted `path` in its own spawned process with
+    Django set up, for long-running workers that shouldn't sit in a pool.
+    The function is passed by name because it can only be imported once
+    Django is configured. Returns the started multiprocessing.Process.
+    """
+    connections.close_all()
+    process = multiprocessing.get_context('spawn').Process(
+        target=_run_in_worker, args=(_settings_module(), path, args, kwargs)
+    )
+    process.start()
+    return process
+
+
+def process_pool(workers):
+    """
+    Return a ProcessPoolExecutor whose workers can use the ORM.
+
+    Workers are spawned (not forked) so they never share the parent's
+    database sockets; each one opens its own connections on first use.
+    """
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(_settings_module(),),
+    )
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from decimal import Decimal
+from itertools import groupby, islice
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Portfolio
+from .pool import process_pool
+from .sharding import shard_aliases
+
+PERCENTILES = (5, 25, 50, 75, 95)
+STEPS_PER_YEAR = 12
+
+
+def get_assumptions(overrides=None):
+    """Merge per-request overrides on top of settings.PROJECTION_ASSUMPTIONS."""
+    assumptions = {
+        key.upper(): dict(value) for key, value in settings.PROJECTION_ASSUMPTIONS.items()
+    }
+    for category, values in (overrides or {}).items():
+        assumptions.setdefault(category.upper(), {}).update(values)
+    return assumptions
+
+
+def _assumption_for(category, assumptions):
+    return assumptions.get(category.upper()) or assumptions['DEFAULT']
+
+
+def load_holdings(user):
+    """Return the user's holdings as (category, current_value, invested) tuples."""
+    portfolios = Portfolio.objects.for_user(user).filter(units__gt=0).select_related('scheme')
+    return [
+        (p.scheme.category, p.current_value(), p.invested_amount)
+        for p in portfolios
+    ]
+
+
+def holdings_fingerprint(holdings):
+    """Stable hash of the holdings; any change in units or NAV changes it."""
+    digest = hashlib.sha1()
+    for category, value, invested in sorted(holdings):
+        digest.update(f"{category}|{value}|{invested};".encode())
+    return digest.hexdigest()
+
+
+def cache_key(user_id, holdings, years, paths, assumptions):
+    params = json.dumps(assumptions, sort_keys=True)
+    params_hash = hashlib.sha1(params.encode()).hexdigest()[:12]
+    return f"projection:{user_id}:{holdings_fingerprint(holdings)}:{years}:{paths}:{params_hash}"
+
+
+def simulate(holdings, years, paths, assumptions, seed=None):
+    """
+    Run a vectorised Monte Carlo projection of the holdings.
+
+    Each category is modelled as geometric Brownian motion with monthly
+    steps. Paths are generated in blocks of PROJECTION_BLOCK_PATHS and each
+    category is summed into a single (paths, years) matrix, so only one
+    (block, steps) array is alive at a time whatever the path count.
+    """
+    rng = np.random.default_rng(seed)
+    steps = years * STEPS_PER_YEAR
+    dt = 1.0 / STEPS_PER_YEAR
+
+    # Collapse holdings to one starting value per category.
+    by_category = {}
+    for category, value, _invested in holdings:
+        key = category.upper()
+        by_category[key] = by_category.get(key, 0.0) + float(value)
+
+    totals = np.zeros((paths, years))
+    block_size = settings.PROJECTION_BLOCK_PATHS
+    for start in range(0, paths, block_size):
+        block = totals[start:start + block_size]
+        for category, start_value in by_category.items():
+            assumption = _assumption_for(category, assumptions)
+            mu = float(assumption['expected_return'])
+            sigma = float(assumption['volatility'])
+
+            # Shocks become log returns and then cumulative log returns in place.
+            log_returns = rng.standard_normal((len(block), steps))
+            log_returns *= sigma * np.sqrt(dt)
+            log_returns += (mu - 0.5 * sigma ** 2) * dt
+            np.cumsum(log_returns, axis=1, out=log_returns)
+
+            # Keep only the year-end points.
+            year_end = log_returns[:, STEPS_PER_YEAR - 1::STEPS_PER_YEAR]
+            block += start_value * np.exp(year_end)
+
+    bands = np.percentile(totals, PERCENTILES, axis=0)
+    return [
+        {
+            'year': year + 1,
+            **{f'p{pct}': round(float(bands[i, year]), 2) for i, pct in enumerate(PERCENTILES)},
+        }
+        for year in range(years)
+    ]
+
+
+def build_projection(holdings, years, paths, assumptions):
+    current_value = sum((value for _c, value, _i in holdings), Decimal('0.00'))
+    invested = sum((invested for _c, _v, invested in holdings), Decimal('0.00'))
+    return {
+        'years': years,
+        'paths': paths,
+        'current_value': float(current_value),
+        'total_invested': float(invested),
+        'percentiles': list(PERCENTILES),
+        'bands': simulate(holdings, years, paths, assumptions) if holdings else [],
+        'assumptions': assumptions,
+    }
+
+
+def project_user(user, years, paths, assumption_overrides=None):
+    """Projection for one user, served from cache until the holdings change."""
+    assumptions = get_assumptions(assumption_overrides)
+    holdings = load_holdings(user)
+    key = cache_key(user.pk, holdings, years, paths, assumptions)
+
+    result = cache.get(key)
+    if result is None:
+        result = build_projection(holdings, years, paths, assumptions)
+        cache.set(key, result, settings.PROJECTION_CACHE_TIMEOUT)
+    return result
+
+
+def _project_chunk(batch, years, paths, assumptions):
+    # Runs inside a pool worker: pure NumPy, no database access needed.
+    return [
+        (key, build_projection(holdings, years, paths, assumptions))
+        for key, holdings in batch
+    ]
+
+
+def _holdings_by_user():
+    """
+    Yield (user_id, holdings) one user at a time, shard by shard.
+
+    Each user's rows live on a single shard and the cursor is ordered by
+    user, so only the current user's rows are held in memory.
+    """
+    for alias in shard_aliases():
+        rows = (
+            Portfolio.objects.using(alias)
+            .filter(units__gt=0)
+            .order_by('user_id')
+            .values_list('user_id', 'scheme__category', 'units', 'scheme__nav', 'invested_amount')
+            .iterator(chunk_size=2000)
+        )
+        for user_id, group in groupby(rows, key=itemgetter(0)):
+            # Same tuples as load_holdings(), so the cache keys match.
+            yield user_id, [
+                (category, units * nav, invested)
+                for _user_id, category, units, nav, invested in group
+            ]
+
+
+def project_all(years, paths, workers=None, chunk_size=200):
+    """
+    Project every portfolio through a process pool.
+
+    Holdings are read in chunks of chunk_size users; each chunk's cached
+    projections are looked up with one get_many and only the users whose
+    holdings changed go to the pool. At most two chunks per worker are in
+    flight, so the parent's memory stays bounded however many users there
+    are. Returns a (projected, skipped) pair.
+    """
+    assumptions = get_assumptions()
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    projected = 0
+    skipped = 0
+
+    def store(futures):
+        nonlocal projected
+        for future in futures:
+            results = dict(future.result())
+            cache.set_many(results, settings.PROJECTION_CACHE_TIMEOUT)
+            projected += len(results)
+
+    users = _holdings_by_user()
+    in_flight = set()
+    with process_pool(workers) as pool:
+        while True:
+            batch = {
+                cache_key(user_id, holdings, years, paths, assumptions): holdings
+                for user_id, holdings in islice(users, chunk_size)
+            }
+            if not batch:
+                break
+            cached = cache.get_many(list(batch))
+            skipped += len(cached)
+            pending = [(key, holdings) for key, holdings in batch.items() if key not in cached]
+            if not pending:
+                continue
+
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                store(done)
+            in_flight.add(pool.submit(_project_chunk, pending, years, paths, assumptions))
+        store(in_flight)
+
+    return projected, skipped
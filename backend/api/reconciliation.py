@@ -0,0 +1,225 @@
+import csv
+import logging
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.db.models import Case, When, F, Sum, Max, Min, DecimalField
+
+from .models import BankAccount, Portfolio, MFTransaction
+from .pool import process_pool
+from .sharding import shard_aliases
+from .versioning import bump_user_versions
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+ZERO_UNITS = Decimal('0.0000')
+ZERO_AMOUNT = Decimal('0.00')
+REPAIR_BATCH_SIZE = 500
+
+REPORT_FIELDS = (
+    'kind', 'user_id', 'scheme_id', 'portfolio_id',
+    'recorded_units', 'expected_units', 'recorded_invested', 'expected_invested',
+)
+
+
+def _signed(field, decimal_places):
+    # SELL rows reduce holdings; BUY (and anything else) add to them.
+    return Sum(
+        Case(
+            When(transaction_type='SELL', then=-F(field)),
+            default=F(field),
+        ),
+        output_field=DecimalField(max_digits=20, decimal_places=decimal_places),
+    )
+
+
+def _ledger_totals(transactions):
+    """{(user_id, scheme_id): (units, invested)} summed from the ledger."""
+    return {
+        (row['user_id'], row['scheme_id']): (
+            row['units'].quantize(ZERO_UNITS), row['amount'].quantize(ZERO_AMOUNT),
+        )
+        for row in transactions
+        .order_by()
+        .values('user_id', 'scheme_id')
+        .annotate(units=_signed('units', 4), amount=_signed('amount', 2))
+    }
+
+
+def user_ranges(chunk_size):
+    """
+    Split the user id space into half-open [lo, hi) ranges.
+
+    Ranges sit on fixed multiples of chunk_size rather than starting at the
+    lowest id, so the same id always falls in the same range even after
+    users are added or deleted; statement checkpoints rely on that.
+    """
+    bounds = User.objects.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        return []
+    first = bounds['lo'] // chunk_size * chunk_size
+    return [(lo, lo + chunk_size) for lo in range(first, bounds['hi'] + 1, chunk_size)]
+
+
+def reconcile_range(lo, hi, repair=False, using='default'):
+    """
+    Compare Portfolio rows with the transaction ledger for users in [lo, hi)
+    on one database (a shard, or 'default' when sharding is off).
+
+    Transactions are aggregated per (user, scheme) in SQL, so only one row
+    per holding crosses the wire. Returns (users_checked, drift_rows,
+    repaired); with repair=True the drifted users' portfolios are rewritten
+    from the ledger and `repaired` counts the rows actually written. A
+    repair batch that fails (e.g. chosen as a deadlock victim) is logged
+    and left for the next run; its rows stay in the report.
+    """
+    expected = _ledger_totals(
+        MFTransaction.objects.using(using).filter(user_id__gte=lo, user_id__lt=hi)
+    )
+
+    drift = []
+    portfolios = Portfolio.objects.using(using).filter(user_id__gte=lo, user_id__lt=hi).only(
+        'id', 'user_id', 'scheme_id', 'units', 'invested_amount'
+    )
+    for portfolio in portfolios:
+        key = (portfolio.user_id, portfolio.scheme_id)
+        kind = 'MISMATCH' if key in expected else 'ORPHAN_PORTFOLIO'
+        units, invested = expected.pop(key, (ZERO_UNITS, ZERO_AMOUNT))
+        if portfolio.units == units and portfolio.invested_amount == invested:
+            continue
+
+        drift.append((
+            kind, portfolio.user_id, portfolio.scheme_id, portfolio.id,
+            portfolio.units, units, portfolio.invested_amount, invested,
+        ))
+
+    # Whatever is left has transactions but no portfolio row at all.
+    for (user_id, scheme_id), (units, invested) in expected.items():
+        drift.append((
+            'MISSING_PORTFOLIO', user_id, scheme_id, None,
+            None, units, None, invested,
+        ))
+
+    # Holdings drift is repairable; a negative balance (below) is not.
+    drifted_users = sorted({row[1] for row in drift})
+
+    # There is no deposit ledger to replay, so the only balance invariant
+    # we can check is that purchases never drove it below zero.
+    for account in BankAccount.objects.using(using).filter(
+        user_id__gte=lo, user_id__lt=hi, balance__lt=0
+    ).only('user_id', 'balance'):
+        drift.append((
+            'NEGATIVE_BALANCE', account.user_id, None, None,
+            None, None, account.balance, ZERO_AMOUNT,
+        ))
+
+    repaired = 0
+    if repair:
+        for start in range(0, len(drifted_users), REPAIR_BATCH_SIZE):
+            batch = drifted_users[start:start + REPAIR_BATCH_SIZE]
+            try:
+                repaired += repair_users(batch, using)
+            except DatabaseError:
+                logger.exception("Repair failed on %s for users %s-%s", using, batch[0], batch[-1])
+
+    # Each shard holds copies of exactly the users homed there, so counting
+    # per database never counts a user twice.
+    users_checked = User.objects.using(using).filter(id__gte=lo, id__lt=hi).count()
+    return users_checked, drift, repaired
+
+
+def repair_users(user_ids, using='default'):
+    """
+    Rewrite the given users' portfolios from the ledger; returns the number
+    of rows updated or created.
+
+    The scan above ran without locks, so a purchase may have landed since.
+    Locks are taken in the order purchases and NAV bumps use: the users'
+    bank accounts (purchases take that lock before touching the ledger),
+    then the users themselves, then their portfolio rows. Only then is the
+    ledger re-aggregated, so what gets written matches the ledger at
+    commit. Repaired rows are stamped with each user's next change version
+    so cached views notice the change.
+    """
+    with transaction.atomic(), transaction.atomic(using=using):
+        list(
+            BankAccount.objects.using(using).select_for_update()
+            .filter(user_id__in=user_ids).order_by('user_id').values_list('id', flat=True)
+        )
+        list(
+            User.objects.select_for_update()
+            .filter(id__in=user_ids).order_by('id').values_list('id', flat=True)
+        )
+        portfolios = list(
+            Portfolio.objects.using(using).select_for_update()
+            .filter(user_id__in=user_ids).order_by('user_id', 'scheme_id')
+        )
+        expected = _ledger_totals(
+            MFTransaction.objects.using(using).filter(user_id__in=user_ids)
+        )
+
+        to_update = []
+        for portfolio in portfolios:
+            units, invested = expected.pop(
+                (portfolio.user_id, portfolio.scheme_id), (ZERO_UNITS, ZERO_AMOUNT)
+            )
+            if portfolio.units != units or portfolio.invested_amount != invested:
+                portfolio.units = units
+                portfolio.invested_amount = invested
+                to_update.append(portfolio)
+        to_create = [
+            Portfolio(user_id=user_id, scheme_id=scheme_id, units=units, invested_amount=invested)
+            for (user_id, scheme_id), (units, invested) in expected.items()
+        ]
+        if not to_update and not to_create:
+            return 0
+
+        versions = bump_user_versions({p.user_id for p in to_update + to_create})
+        for portfolio in to_update + to_create:
+            portfolio.version = versions[portfolio.user_id]
+        Portfolio.objects.using(using).bulk_update(
+            to_update, ['units', 'invested_amount', 'version'], batch_size=1000
+        )
+        Portfolio.objects.using(using).bulk_create(to_create, batch_size=1000)
+    return len(to_update) + len(to_create)
+
+
+def reconcile_all(output_path, workers=None, chunk_size=5000, repair=False):
+    """
+    Reconcile every user through a process pool and write a drift report.
+
+    Only drifted holdings are written, one CSV row each, as results arrive.
+    A range that fails is logged and skipped so the rest of the run still
+    lands in the report. Returns (users_checked, drift_count,
+    repaired_count, failed_ranges) with failed_ranges as (lo, hi, shard).
+    """
+    ranges = user_ranges(chunk_size)
+    users_checked = 0
+    drift_count = 0
+    repaired_count = 0
+    failed = []
+
+    with open(output_path, 'w', newline='') as report, process_pool(workers) as pool:
+        writer = csv.writer(report)
+        writer.writerow(REPORT_FIELDS)
+
+        futures = {
+            pool.submit(reconcile_range, lo, hi, repair, alias): (lo, hi, alias)
+            for lo, hi in ranges
+            for alias in shard_aliases()
+        }
+        for future, key in futures.items():
+            try:
+                checked, drift, repaired = future.result()
+            except Exception:
+                logger.exception("Reconciling users %s-%s on %s failed", *key)
+                failed.append(key)
+                continue
+            users_checked += checked
+            drift_count += len(drift)
+            repaired_count += repaired
+            writer.writerows(drift)
+
+    return users_checked, drift_count, repaired_count, failed
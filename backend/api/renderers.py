@@ -0,0 +1,20 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets content negotiation accept EventSource's text/event-stream.
+
+    The stream itself is a StreamingHttpResponse and bypasses rendering;
+    this only renders error payloads (e.g. 401) as a single SSE message.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode(self.charset)
@@ -0,0 +1,143 @@
+"""
+Trailing returns and risk figures for every scheme, computed in one pass.
+
+NAV history is loaded into a (schemes x dates) matrix with one column per
+date that has any snapshot. Gaps are forward-filled with the last known
+NAV, so "NAV on date d" always means the latest NAV published on or
+before d. Each figure is then one vectorised expression over all schemes.
+"""
+import warnings
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MutualFundScheme, NAVSnapshot, SchemeMetrics
+
+PERIODS = (1, 3, 5)
+# How far before the longest period's start date to look for a NAV.
+LOOKBACK_DAYS = 31
+# Fewer returns than this in the last year gives no volatility figure.
+MIN_VOLATILITY_POINTS = 20
+
+
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        # 29 February
+        return day.replace(year=day.year - years, day=28)
+
+
+def load_nav_matrix(as_of):
+    """
+    Return (scheme_ids, date_ordinals, navs) where navs is a forward-filled
+    float matrix with NaN before each scheme's first snapshot.
+    """
+    start = _years_before(as_of, max(PERIODS)) - timedelta(days=LOOKBACK_DAYS)
+    rows = list(
+        NAVSnapshot.objects.filter(date__gte=start, date__lte=as_of)
+        .order_by()
+        .values_list('scheme_id', 'date', 'nav')
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 0))
+
+    scheme_col = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    date_col = np.fromiter((r[1].toordinal() for r in rows), dtype=np.int64, count=len(rows))
+    nav_col = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+
+    scheme_ids = np.unique(scheme_col)
+    dates = np.unique(date_col)
+    navs = np.full((len(scheme_ids), len(dates)), np.nan)
+    navs[np.searchsorted(scheme_ids, scheme_col), np.searchsorted(dates, date_col)] = nav_col
+
+    # Forward-fill: for every cell take the column of the latest observation.
+    observed = np.where(np.isnan(navs), 0, np.arange(len(dates)))
+    np.maximum.accumulate(observed, axis=1, out=observed)
+    navs = navs[np.arange(len(scheme_ids))[:, None], observed]
+    return scheme_ids, dates, navs
+
+
+def _column_on_or_before(dates, day):
+    # -1 when the history doesn't reach back that far.
+    return int(np.searchsorted(dates, day.toordinal(), side='right')) - 1
+
+
+def compute_metrics(dates, navs, as_of):
+    """
+    Vectorised screener figures for a forward-filled NAV matrix. Returns a
+    dict of per-scheme arrays in percent, NaN where there's too little
+    history.
+    """
+    latest = navs[:, -1]
+    metrics = {}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for years in PERIODS:
+            column = _column_on_or_before(dates, _years_before(as_of, years))
+            if column < 0:
+                metrics[f'return_{years}y'] = np.full(len(navs), np.nan)
+                continue
+            growth = latest / navs[:, column]
+            metrics[f'return_{years}y'] = (growth ** (1.0 / years) - 1.0) * 100
+
+        # Volatility of period-on-period log returns over the last year,
+        # annualised by how many periods the year actually had.
+        column = max(_column_on_or_before(dates, _years_before(as_of, 1)), 0)
+        window = np.log(navs[:, column:])
+        returns = np.diff(window, axis=1)
+        points = np.sum(np.isfinite(returns), axis=1)
+        span_years = max((dates[-1] - dates[column]) / 365.25, 1 / 365.25)
+        periods_per_year = returns.shape[1] / span_years
+        with warnings.catch_warnings():
+            # Rows with no returns yet come out as NaN, which is what we want.
+            warnings.simplefilter('ignore', RuntimeWarning)
+            volatility = np.nanstd(returns, axis=1, ddof=1)
+        metrics['volatility_1y'] = np.where(
+            points >= MIN_VOLATILITY_POINTS, volatility * np.sqrt(periods_per_year) * 100, np.nan
+        )
+
+        # Worst fall from a running peak across the whole loaded window.
+        peaks = np.fmax.accumulate(navs, axis=1)
+        drawdowns = np.where(np.isnan(navs), np.inf, navs / peaks - 1.0)
+        worst = drawdowns.min(axis=1)
+        metrics['max_drawdown'] = np.where(np.isfinite(worst), worst * 100, np.nan)
+
+    return metrics
+
+
+def _clean(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def refresh_scheme_metrics(as_of=None):
+    """Recompute SchemeMetrics for every scheme; returns how many were written."""
+    as_of = as_of or timezone.localdate()
+    scheme_ids, dates, navs = load_nav_matrix(as_of)
+    metrics = compute_metrics(dates, navs, as_of) if len(scheme_ids) else {}
+    row_for = {int(scheme_id): i for i, scheme_id in enumerate(scheme_ids)}
+
+    # Schemes without any history still get a row, so they sort last
+    # instead of dropping out of the screener.
+    fields = ['return_1y', 'return_3y', 'return_5y', 'volatility_1y', 'max_drawdown']
+    rows = []
+    for scheme_id in MutualFundScheme.objects.values_list('id', flat=True):
+        i = row_for.get(scheme_id)
+        values = {
+            field: _clean(metrics[field][i]) if i is not None else None
+            for field in fields
+        }
+        rows.append(SchemeMetrics(scheme_id=scheme_id, as_of=as_of, **values))
+
+    with transaction.atomic():
+        SchemeMetrics.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['scheme'],
+            update_fields=fields + ['as_of', 'computed_at'],
+        )
+    return len(rows)
@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from .models import BankAccount, MutualFundScheme, Portfolio, MFTransaction
+from django.conf import settings
+from .models import BankAccount, MutualFundScheme, Portfolio, MFTransaction, Job, SchemeMetrics
+from .jobs import HANDLERS
+from .sharding import shard_for_user
 from decimal import Decimal
 
 User = get_user_model()
@@ -60,6 +63,11 @@ class BankAccountSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Balance cannot be negative.")
         return value
 
+    def create(self, validated_data):
+        # Write to the owner's shard ('default' unless sharding is enabled).
+        shard = shard_for_user(validated_data['user'].pk)
+        return BankAccount.objects.db_manager(shard).create(**validated_data)
+
 
 class BankAccountUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -78,11 +86,19 @@ class BalanceUpdateSerializer(serializers.Serializer):
 
 
 # --- MUTUAL FUND SCHEME SERIALIZERS ---
+class SchemeMetricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SchemeMetrics
+        fields = ('return_1y', 'return_3y', 'return_5y', 'volatility_1y', 'max_drawdown', 'as_of')
+
+
 class MutualFundSchemeSerializer(serializers.ModelSerializer):
+    metrics = SchemeMetricsSerializer(read_only=True, default=None)
+
     class Meta:
         model = MutualFundScheme
         fields = ('id', 'name', 'scheme_code', 'description', 'category',
-                  'nav', 'is_active', 'created_at', 'updated_at')
+                  'nav', 'is_active', 'metrics', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
     def validate_nav(self, value):
@@ -164,4 +180,45 @@ class UserPortfolioSerializer(serializers.Serializer):
     portfolios = PortfolioSerializer(many=True)
     total_invested = serializers.DecimalField(max_digits=15, decimal_places=2)
     total_current_value = serializers.DecimalField(max_digits=15, decimal_places=2)
-    total_profit_loss = serializers.DecimalField(max_digits=15, decimal_places=2)
\ No newline at end of file
+    total_profit_loss = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+
+# --- PROJECTION SERIALIZERS ---
+class CategoryAssumptionSerializer(serializers.Serializer):
+    expected_return = serializers.FloatField(min_value=-1.0, max_value=1.0)
+    volatility = serializers.FloatField(min_value=0.0, max_value=2.0)
+
+
+class ProjectionRequestSerializer(serializers.Serializer):
+    years = serializers.IntegerField(min_value=5, max_value=20, default=10)
+    paths = serializers.IntegerField(
+        min_value=settings.PROJECTION_DEFAULT_PATHS,
+        max_value=settings.PROJECTION_MAX_PATHS,
+        default=settings.PROJECTION_DEFAULT_PATHS,
+    )
+    assumptions = serializers.DictField(child=CategoryAssumptionSerializer(), required=False)
+
+
+# --- JOB SERIALIZERS ---
+class JobSerializer(serializers.ModelSerializer):
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'payload', 'status', 'priority', 'attempts', 'max_attempts',
+                  'run_at', 'result', 'error', 'created_by_username',
+                  'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
+
+
+class JobCreateSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=50)
+    payload = serializers.DictField(required=False, default=dict)
+    priority = serializers.IntegerField(min_value=-100, max_value=100, default=0)
+    max_attempts = serializers.IntegerField(min_value=1, max_value=10, required=False)
+    delay = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_name(self, value):
+        if value not in HANDLERS:
+            raise serializers.ValidationError(f"Unknown job. Choose one of: {', '.join(sorted(HANDLERS))}.")
+        return value
@@ -0,0 +1,148 @@
+"""
+Opt-in hash sharding of per-user data by user id.
+
+With SHARD_DATABASES empty (the default) every helper here resolves to the
+'default' database and nothing changes. When shards are configured:
+
+* BankAccount, Portfolio, MFTransaction and HoldingValuation rows live on
+  the shard picked by hashing their user id.
+* 'default' stays the directory: users, schemes, jobs and change events.
+* Users are copied to their home shard and schemes to every shard so the
+  foreign keys on each shard stay valid.
+
+Per-user code goes through Model.objects.for_user(user); admin-wide reads
+use scatter() to run one query per shard in parallel.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+SHARDED_MODELS = {'bankaccount', 'portfolio', 'mftransaction', 'holdingvaluation'}
+
+
+def is_sharded():
+    return bool(settings.SHARD_DATABASES)
+
+
+def shard_aliases():
+    return list(settings.SHARD_DATABASES) or ['default']
+
+
+def shard_for_user(user_id):
+    """Stable home database for a user id."""
+    shards = settings.SHARD_DATABASES
+    if not shards:
+        return 'default'
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+def scatter(fn, aliases=None):
+    """
+    Call fn(alias) for every shard in parallel and return the results in
+    shard order. Each call runs on its own thread with its own connection,
+    which is closed afterwards.
+    """
+    aliases = aliases or shard_aliases()
+    if len(aliases) == 1:
+        return [fn(aliases[0])]
+
+    def run(alias):
+        try:
+            return fn(alias)
+        finally:
+            connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(pool.map(run, aliases))
+
+
+class ShardRouter:
+    """
+    Routes sharded models by the user id found in the routing hints.
+
+    Queries without an instance hint (e.g. Portfolio.objects.filter(...))
+    can't be routed and fall through to 'default', which is why per-user
+    code must use for_user() or an explicit using().
+    """
+
+    def _shard_from_hints(self, model, hints):
+        if model._meta.model_name not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._meta.model_name in SHARDED_MODELS:
+            user_id = getattr(instance, 'user_id', None)
+        elif instance._meta.label == settings.AUTH_USER_MODEL:
+            # Reverse relations like user.portfolios.all()
+            user_id = instance.pk
+        else:
+            return None
+        return shard_for_user(user_id) if user_id is not None else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard_from_hints(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_from_hints(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users and schemes are replicated, so rows on a shard may point
+        # at objects loaded from 'default'.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every database gets the full schema; replicated tables must exist
+        # on the shards for their foreign keys.
+        return True
+
+
+def _replicate(instance, aliases):
+    model = type(instance)
+    fields = {
+        field.attname: getattr(instance, field.attname)
+        for field in model._meta.concrete_fields
+        if not field.primary_key
+    }
+    for alias in aliases:
+        model._base_manager.using(alias).update_or_create(pk=instance.pk, defaults=fields)
+
+
+def _replicate_user(sender, instance, using, raw=False, **kwargs):
+    if using == 'default' and not raw:
+        _replicate(instance, [shard_for_user(instance.pk)])
+
+
+def _delete_user_copy(sender, instance, using, **kwargs):
+    if using == 'default':
+        sender._base_manager.using(shard_for_user(instance.pk)).filter(pk=instance.pk).delete()
+
+
+def _replicate_scheme(sender, instance, using, raw=False, **kwargs):
+    if using == 'default' and not raw:
+        _replicate(instance, shard_aliases())
+
+
+def _delete_scheme_copies(sender, instance, using, **kwargs):
+    if using == 'default':
+        for alias in shard_aliases():
+            sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def connect_replication():
+    """Keep shard copies of users and schemes in step with 'default'."""
+    if not is_sharded():
+        return
+
+    from django.contrib.auth import get_user_model
+    from django.db.models.signals import post_delete, post_save
+    from .models import MutualFundScheme
+
+    User = get_user_model()
+    post_save.connect(_replicate_user, sender=User, dispatch_uid='shard_replicate_user')
+    post_delete.connect(_delete_user_copy, sender=User, dispatch_uid='shard_delete_user')
+    post_save.connect(_replicate_scheme, sender=MutualFundScheme, dispatch_uid='shard_replicate_scheme')
+    post_delete.connect(_delete_scheme_copies, sender=MutualFundScheme, dispatch_uid='shard_delete_scheme')
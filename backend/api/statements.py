@@ -0,0 +1,294 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import as_completed
+from datetime import datetime, time
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import MFTransaction, MutualFundScheme, NAVSnapshot
+from .pdf import render_text_pdf
+from .pool import process_pool
+from .reconciliation import ZERO_AMOUNT, ZERO_UNITS, _signed, user_ranges
+from .sharding import shard_aliases
+
+User = get_user_model()
+
+FORMATS = ('csv', 'pdf')
+NAV_PLACES = Decimal('0.0001')
+
+
+def _money(value):
+    # Adding zero turns a rounded-away loss like -0.00 into 0.00.
+    return value.quantize(Decimal('0.01')) + 0
+
+
+class _GroupStream:
+    """
+    Walks a queryset ordered by user_id one user at a time.
+
+    Lets a worker merge-join users, holdings and transactions from three
+    server-side cursors without holding more than one user's rows.
+    """
+
+    def __init__(self, rows):
+        self._groups = groupby(rows, key=itemgetter(0))
+        self._head = next(self._groups, None)
+
+    def take(self, user_id):
+        while self._head is not None and self._head[0] < user_id:
+            self._head = next(self._groups, None)
+        if self._head is None or self._head[0] != user_id:
+            return []
+        rows = [row[1:] for row in self._head[1]]
+        self._head = next(self._groups, None)
+        return rows
+
+
+def navs_as_of(day):
+    """
+    {scheme_id: (nav, nav_date)} from each scheme's last NAV snapshot on or
+    before `day`. Schemes whose history starts later fall back to their
+    current NAV, dated by its last update.
+    """
+    latest = NAVSnapshot.objects.filter(scheme=OuterRef('pk'), date__lte=day).order_by('-date')
+    rows = (
+        MutualFundScheme.objects.using('default')
+        .annotate(nav_on=Subquery(latest.values('nav')[:1]),
+                  nav_date=Subquery(latest.values('date')[:1]))
+        .values_list('id', 'nav_on', 'nav_date', 'nav', 'updated_at')
+    )
+    return {
+        # SQLite drops the scale of a subquery's decimal.
+        scheme_id: (nav_on.quantize(NAV_PLACES), nav_date) if nav_on is not None
+        else (nav, timezone.localdate(updated_at))
+        for scheme_id, nav_on, nav_date, nav, updated_at in rows
+    }
+
+
+def build_statement(user, holdings, transactions, start, end):
+    """
+    Assemble one user's statement from raw holding rows (as of `end`) and
+    the period's transaction rows.
+    """
+    holding_lines = []
+    total_invested = Decimal('0.00')
+    total_value = Decimal('0.00')
+    for scheme_name, scheme_code, units, invested, nav, nav_date in holdings:
+        value = units * nav
+        total_invested += invested
+        total_value += value
+        holding_lines.append({
+            'scheme': scheme_name,
+            'scheme_code': scheme_code,
+            'units': units,
+            'nav': nav,
+            'nav_date': nav_date.isoformat(),
+            'invested': invested,
+            'current_value': _money(value),
+            'profit_loss': _money(value - invested),
+        })
+
+    return {
+        'user': user,
+        'start': start,
+        'end': end,
+        'holdings': holding_lines,
+        'transactions': [
+            {
+                'date': date.date().isoformat(),
+                'type': txn_type,
+                'scheme': scheme_name,
+                'units': units,
+                'nav': nav,
+                'amount': amount,
+            }
+            for date, txn_type, scheme_name, units, nav, amount in transactions
+        ],
+        'total_invested': total_invested,
+        'total_current_value': _money(total_value),
+        'total_profit_loss': _money(total_value - total_invested),
+    }
+
+
+def render_csv(statement):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    user_id, username, first_name, last_name, email = statement['user']
+    writer.writerow(['Statement', f"{statement['start']} to {statement['end']}"])
+    writer.writerow(['Customer', f"{first_name} {last_name}".strip() or username, email])
+
+    writer.writerow([])
+    writer.writerow(['Holdings', f"as of {statement['end']}"])
+    writer.writerow(['Scheme', 'Code', 'Units', 'NAV', 'NAV Date', 'Invested', 'Value', 'Gain/Loss'])
+    for h in statement['holdings']:
+        writer.writerow([h['scheme'], h['scheme_code'], h['units'], h['nav'], h['nav_date'],
+                         h['invested'], h['current_value'], h['profit_loss']])
+    writer.writerow(['Total', '', '', '', '', statement['total_invested'],
+                     statement['total_current_value'], statement['total_profit_loss']])
+
+    writer.writerow([])
+    writer.writerow(['Transactions'])
+    writer.writerow(['Date', 'Type', 'Scheme', 'Units', 'NAV', 'Amount'])
+    for t in statement['transactions']:
+        writer.writerow([t['date'], t['type'], t['scheme'], t['units'], t['nav'], t['amount']])
+    return buf.getvalue().encode()
+
+
+def render_pdf(statement):
+    user_id, username, first_name, last_name, email = statement['user']
+    lines = [
+        'ACCOUNT STATEMENT',
+        f"Period:   {statement['start']} to {statement['end']}",
+        f"Customer: {f'{first_name} {last_name}'.strip() or username} <{email}>",
+        '',
+        f"HOLDINGS AS OF {statement['end']}",
+        f"{'Scheme':<30}{'Units':>12}{'NAV':>11}{'NAV Date':>12}{'Invested':>13}{'Value':>13}{'Gain/Loss':>13}",
+    ]
+    for h in statement['holdings']:
+        lines.append(
+            f"{h['scheme'][:29]:<30}{h['units']:>12}{h['nav']:>11}{h['nav_date']:>12}"
+            f"{h['invested']:>13}{h['current_value']:>13}{h['profit_loss']:>13}"
+        )
+    lines.append(
+        f"{'TOTAL':<65}{statement['total_invested']:>13}"
+        f"{statement['total_current_value']:>13}{statement['total_profit_loss']:>13}"
+    )
+    lines += ['', 'TRANSACTIONS', f"{'Date':<12}{'Type':<6}{'Scheme':<30}{'Units':>12}{'NAV':>11}{'Amount':>13}"]
+    for t in statement['transactions']:
+        lines.append(
+            f"{t['date']:<12}{t['type']:<6}{t['scheme'][:29]:<30}"
+            f"{t['units']:>12}{t['nav']:>11}{t['amount']:>13}"
+        )
+    if not statement['transactions']:
+        lines.append('No transactions in this period.')
+    return render_text_pdf(lines)
+
+
+RENDERERS = {'csv': render_csv, 'pdf': render_pdf}
+
+
+def statement_path(output_dir, user_id, start, end, fmt):
+    # Bucket files by thousands of user ids to keep directories small.
+    return os.path.join(output_dir, f"{user_id // 1000:06d}", f"{user_id}_{start}_{end}.{fmt}")
+
+
+def render_range(lo, hi, output_dir, fmt, start, end, using='default'):
+    """
+    Write statements for customers with ids in [lo, hi) whose data lives on
+    the given database; returns how many.
+
+    Holdings are valued as of `end`: units and invested amounts are replayed
+    from the ledger up to that day and priced with navs_as_of(end), so a
+    statement for a past period doesn't show today's positions.
+    """
+    period_start = timezone.make_aware(datetime.combine(start, time.min))
+    period_end = timezone.make_aware(datetime.combine(end, time.max))
+
+    users = (
+        User.objects.using(using).filter(id__gte=lo, id__lt=hi, role='CUSTOMER')
+        .order_by('id')
+        .values_list('id', 'username', 'first_name', 'last_name', 'email')
+        .iterator(chunk_size=1000)
+    )
+    navs = navs_as_of(end)
+    holdings = _GroupStream(
+        (user_id, name, code, units.quantize(ZERO_UNITS), invested.quantize(ZERO_AMOUNT),
+         *navs[scheme_id])
+        for user_id, scheme_id, name, code, units, invested in
+        MFTransaction.objects.using(using).filter(
+            user_id__gte=lo, user_id__lt=hi, transaction_date__lte=period_end,
+        )
+        .values('user_id', 'scheme_id', 'scheme__name', 'scheme__scheme_code')
+        .annotate(held=_signed('units', 4), invested=_signed('amount', 2))
+        .filter(held__gt=0)
+        .order_by('user_id', 'scheme__name', 'scheme_id')
+        .values_list('user_id', 'scheme_id', 'scheme__name', 'scheme__scheme_code',
+                     'held', 'invested')
+        .iterator(chunk_size=2000)
+    )
+    transactions = _GroupStream(
+        MFTransaction.objects.using(using).filter(
+            user_id__gte=lo, user_id__lt=hi,
+            transaction_date__gte=period_start, transaction_date__lte=period_end,
+        )
+        .order_by('user_id', 'transaction_date', 'id')
+        .values_list('user_id', 'transaction_date', 'transaction_type', 'scheme__name',
+                     'units', 'nav_at_transaction', 'amount')
+        .iterator(chunk_size=2000)
+    )
+
+    render = RENDERERS[fmt]
+    written = 0
+    for user in users:
+        user_id = user[0]
+        statement = build_statement(
+            user, holdings.take(user_id), transactions.take(user_id), start, end
+        )
+        path = statement_path(output_dir, user_id, start, end, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(render(statement))
+        written += 1
+    return written
+
+
+def _checkpoint_path(output_dir, start, end, fmt):
+    return os.path.join(output_dir, f".checkpoint_{start}_{end}_{fmt}.jsonl")
+
+
+def _load_checkpoint(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                done.add((entry['lo'], entry['hi'], entry.get('shard', 'default')))
+    return done
+
+
+def generate_statements(output_dir, start, end, fmt='csv', workers=None,
+                        chunk_size=1000, progress=None):
+    """
+    Generate statements for every customer through a process pool.
+
+    Each finished user id range is appended to a checkpoint file in the
+    output directory, so re-running the same period and format resumes
+    where the last run stopped. Returns (statements_written, ranges_skipped).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = _checkpoint_path(output_dir, start, end, fmt)
+    done = _load_checkpoint(checkpoint)
+
+    ranges = [
+        (lo, hi, alias)
+        for lo, hi in user_ranges(chunk_size)
+        for alias in shard_aliases()
+        if (lo, hi, alias) not in done
+    ]
+    skipped = len(done)
+    written = 0
+    if not ranges:
+        return written, skipped
+
+    with open(checkpoint, 'a') as log, process_pool(workers) as pool:
+        futures = {
+            pool.submit(render_range, lo, hi, output_dir, fmt, start, end, alias): (lo, hi, alias)
+            for lo, hi, alias in ranges
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            lo, hi, alias = futures[future]
+            count = future.result()
+            written += count
+            log.write(json.dumps({'lo': lo, 'hi': hi, 'shard': alias, 'statements': count}) + '\n')
+            log.flush()
+            if progress:
+                progress(completed, len(ranges), written)
+
+    return written, skipped
@@ -0,0 +1,96 @@
+"""
+Job handlers. Each one takes the job payload as keyword arguments and
+returns a JSON-serialisable result; see api/jobs.py.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+from .jobs import register
+from .models import MutualFundScheme
+from .navs import set_nav
+from .onboarding import import_customers
+from .projections import project_all
+from .reconciliation import reconcile_all
+from .screener import refresh_scheme_metrics
+from .statements import generate_statements
+from .valuation import mark_to_market
+from .versioning import bump_scheme_holders
+
+
+@register('project_portfolios')
+def project_portfolios_job(years=10, paths=None, workers=None, chunk_size=200):
+    projected, skipped = project_all(
+        years, paths or settings.PROJECTION_DEFAULT_PATHS, workers=workers, chunk_size=chunk_size
+    )
+    return {'projected': projected, 'skipped': skipped}
+
+
+@register('reconcile_holdings')
+def reconcile_holdings_job(output='holdings_drift.csv', workers=None, chunk_size=5000, repair=False):
+    users_checked, drift_count, repaired, failed = reconcile_all(
+        output, workers=workers, chunk_size=chunk_size, repair=repair
+    )
+    return {
+        'users_checked': users_checked, 'drift': drift_count,
+        'repaired': repaired, 'failed_ranges': failed, 'output': output,
+    }
+
+
+@register('generate_statements')
+def generate_statements_job(output_dir, start, end, format='csv', workers=None, chunk_size=1000):
+    written, skipped = generate_statements(
+        output_dir, date.fromisoformat(start), date.fromisoformat(end),
+        fmt=format, workers=workers, chunk_size=chunk_size,
+    )
+    return {'written': written, 'ranges_skipped': skipped, 'output_dir': output_dir}
+
+
+@register('mark_to_market')
+def mark_to_market_job(chunk_size=50000):
+    return {'valued': mark_to_market(chunk_size=chunk_size)}
+
+
+@register('refresh_scheme_metrics')
+def refresh_scheme_metrics_job(as_of=None):
+    as_of = date.fromisoformat(as_of) if as_of else None
+    return {'schemes': refresh_scheme_metrics(as_of)}
+
+
+@register('import_customers')
+def import_customers_job(path, errors_path=None, workers=None, chunk_size=2000):
+    report, errors = import_customers(
+        path, errors_path=errors_path, workers=workers, chunk_size=chunk_size
+    )
+    # The full list is in errors_path; keep the job row small.
+    return dict(report, errors=errors[:100], errors_path=errors_path if errors else None)
+
+
+@register('bulk_update_navs')
+def bulk_update_navs_job(navs):
+    """navs maps scheme_code to the new NAV. Unknown codes and bad NAVs are reported, not fatal."""
+    schemes = MutualFundScheme.objects.in_bulk(list(navs), field_name='scheme_code')
+    updated = 0
+    errors = {}
+    for code, value in navs.items():
+        scheme = schemes.get(code)
+        if scheme is None:
+            errors[code] = 'Unknown scheme code.'
+            continue
+        try:
+            nav = Decimal(str(value)).quantize(Decimal('0.0001'))
+        except InvalidOperation:
+            errors[code] = 'Not a number.'
+            continue
+        if nav <= 0:
+            errors[code] = 'NAV must be greater than zero.'
+            continue
+        set_nav(scheme, nav)
+        updated += 1
+    return {'updated': updated, 'errors': errors}
+
+
+@register('bump_scheme_holders')
+def bump_scheme_holders_job(scheme_id):
+    return {'holdings': bump_scheme_holders(scheme_id)}
@@ -0,0 +1,678 @@
+import csv
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import jobs
+from .models import (
+    BankAccount, HoldingValuation, Job, MFTransaction, MutualFundScheme, NAVSnapshot, Portfolio,
+)
+from .onboarding import _Importer, import_customers
+from .reconciliation import user_ranges
+from .sharding import shard_aliases, shard_for_user
+from .statements import _GroupStream, generate_statements, render_range
+from .throttling import MemoryBucketStore, TokenBucketThrottle
+from .valuation import _to_decimal, mark_to_market, value_holdings, verify_valuations
+
+User = get_user_model()
+
+# Database tests touch every shard the settings define, so the suite runs
+# both plain and sharded, e.g. SHARD_COUNT=2 SHARD_SQLITE_DIR=/tmp/shards.
+ALL_DATABASES = {'default', *settings.SHARD_DATABASES}
+
+
+def api_client(user):
+    # A real token rather than force_authenticate, so every request loads
+    # the user afresh (change_version included).
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+# Largest values the model fields allow: units and invested are
+# DecimalField(12, 4) and (12, 2), NAV is DecimalField(10, 4).
+MAX_UNITS = Decimal('99999999.9999')
+MAX_NAV = Decimal('999999.9999')
+MAX_INVESTED = Decimal('9999999999.99')
+
+
+def _fixed(value, places):
+    return int(value.scaleb(places))
+
+
+class ValueHoldingsTests(SimpleTestCase):
+    """value_holdings() must match Decimal arithmetic to the last 10^-8."""
+
+    def assert_matches_decimal(self, cases):
+        units = np.array([_fixed(u, 4) for u, _nav, _inv in cases], dtype=np.int64)
+        navs = np.array([_fixed(nav, 4) for _u, nav, _inv in cases], dtype=np.int64)
+        invested = np.array([_fixed(inv, 2) for _u, _nav, inv in cases], dtype=np.int64)
+
+        value_whole, value_frac, pl_whole, pl_frac = value_holdings(units, navs, invested)
+
+        for i, (u, nav, inv) in enumerate(cases):
+            with self.subTest(units=u, nav=nav, invested=inv):
+                self.assertEqual(_to_decimal(value_whole[i], value_frac[i]), u * nav)
+                self.assertEqual(_to_decimal(pl_whole[i], pl_frac[i]), u * nav - inv)
+                self.assertTrue(0 <= value_frac[i] < 10 ** 8)
+                self.assertTrue(0 <= pl_frac[i] < 10 ** 8)
+
+    def test_overflow_limits(self):
+        # 12-digit units times 10-digit NAV: the full product needs more
+        # than 63 bits, so this only passes if the limbs never overflow.
+        self.assert_matches_decimal([
+            (MAX_UNITS, MAX_NAV, MAX_INVESTED),
+            (MAX_UNITS, MAX_NAV, Decimal('0.00')),
+            (MAX_UNITS, Decimal('0.0001'), Decimal('0.01')),
+            (Decimal('0.0001'), MAX_NAV, Decimal('0.01')),
+            (MAX_UNITS, Decimal('99999.9999'), MAX_INVESTED),
+            (MAX_UNITS, Decimal('100000.0000'), MAX_INVESTED),
+        ])
+
+    def test_losses_borrow_from_whole_rupees(self):
+        # The value's fraction is smaller than the invested paise, so P/L
+        # has to borrow a rupee and keep its fraction non-negative.
+        self.assert_matches_decimal([
+            (Decimal('1.0000'), Decimal('10.0000'), Decimal('10.01')),
+            (Decimal('0.0001'), Decimal('0.0001'), Decimal('0.01')),
+            (Decimal('81.0005'), Decimal('12.3457'), Decimal('1000.00')),
+            (Decimal('0.0000'), Decimal('25.0000'), MAX_INVESTED),
+            (Decimal('3.3333'), Decimal('3.0000'), Decimal('10.00')),
+        ])
+
+    def test_zero_and_exact_values(self):
+        self.assert_matches_decimal([
+            (Decimal('0.0000'), Decimal('0.0000'), Decimal('0.00')),
+            (Decimal('2.0000'), Decimal('5.0000'), Decimal('10.00')),
+            (Decimal('81.0005'), Decimal('12.3457'), Decimal('500.00')),
+        ])
+
+    def test_random_holdings_match_decimal(self):
+        rng = np.random.default_rng(0)
+        cases = [
+            (
+                Decimal(int(u)).scaleb(-4),
+                Decimal(int(nav)).scaleb(-4),
+                Decimal(int(inv)).scaleb(-2),
+            )
+            for u, nav, inv in zip(
+                rng.integers(0, 10 ** 12, 500),
+                rng.integers(0, 10 ** 10, 500),
+                rng.integers(0, 10 ** 12, 500),
+            )
+        ]
+        self.assert_matches_decimal(cases)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _request(user_id):
+    user = SimpleNamespace(pk=user_id, role='CUSTOMER', is_authenticated=True)
+    return SimpleNamespace(user=user, META={})
+
+
+class LoadTestThrottle(TokenBucketThrottle):
+    scope = 'load_test'
+
+
+@override_settings(TOKEN_BUCKET_RATES={'load_test': {'CUSTOMER': '10/min:20'}})
+class ThrottleFairnessTests(SimpleTestCase):
+    """
+    One client flooding an endpoint must not eat into anyone else's limit.
+
+    Simulates ten minutes: client 1 fires 50 requests a second while
+    clients 2-6 each make one request every 6 seconds, exactly their
+    10/min. Time comes from a fake clock, so the run is instant and exact.
+    """
+    seconds = 600
+    flood_per_second = 50
+    polite_clients = range(2, 7)
+    polite_every = 6
+
+    def run_load(self):
+        clock = FakeClock()
+        throttle = LoadTestThrottle()
+        throttle.timer = clock
+        flood_allowed = 0
+        polite_denied = 0
+
+        for second in range(self.seconds):
+            for i in range(self.flood_per_second):
+                clock.now = 1000.0 + second + i / self.flood_per_second
+                flood_allowed += throttle.allow_request(_request(1), None)
+            if second % self.polite_every == 0:
+                for user_id in self.polite_clients:
+                    polite_denied += not throttle.allow_request(_request(user_id), None)
+
+        # Burst of 20 plus 10 a minute refilled over the run.
+        self.assertLessEqual(flood_allowed, 20 + 10 * self.seconds // 60 + 1)
+        self.assertGreaterEqual(flood_allowed, 10 * self.seconds // 60)
+        self.assertEqual(polite_denied, 0)
+
+    @override_settings(THROTTLE_BACKEND='memory')
+    def test_memory_backend_isolates_clients(self):
+        with mock.patch('api.throttling._memory_store', MemoryBucketStore()):
+            self.run_load()
+
+    @override_settings(
+        THROTTLE_BACKEND='cache',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_cache_backend_isolates_clients(self):
+        self.run_load()
+
+
+class AnonThrottle(TokenBucketThrottle):
+    scope = 'anon_test'
+
+
+@override_settings(TOKEN_BUCKET_RATES={'anon_test': {'ANON': '5/min'}}, THROTTLE_BACKEND='memory')
+class AnonymousThrottleTests(SimpleTestCase):
+
+    def anon_request(self, forwarded_for):
+        user = SimpleNamespace(is_authenticated=False)
+        return SimpleNamespace(user=user, META={
+            'REMOTE_ADDR': '203.0.113.7', 'HTTP_X_FORWARDED_FOR': forwarded_for,
+        })
+
+    def test_forged_forwarded_for_does_not_get_a_fresh_bucket(self):
+        throttle = AnonThrottle()
+        throttle.timer = FakeClock()
+        with mock.patch('api.throttling._memory_store', MemoryBucketStore()):
+            allowed = sum(
+                throttle.allow_request(self.anon_request(f'10.0.0.{i}'), None)
+                for i in range(50)
+            )
+        self.assertEqual(allowed, 5)
+
+    def test_memory_store_keeps_at_most_max_keys(self):
+        store = MemoryBucketStore()
+        store.max_keys = 100
+        for i in range(1000):
+            store.consume(f'key:{i}', 5, 1.0, 1000.0)
+        self.assertEqual(len(store._buckets), 100)
+        # The most recently used buckets survive, drained as they were.
+        self.assertEqual(store._buckets['key:999'], (4, 1000.0))
+        self.assertNotIn('key:0', store._buckets)
+
+
+@skipUnless(
+    len(settings.SHARD_DATABASES) >= 2,
+    "needs SHARD_COUNT=2 (or more) and SHARD_SQLITE_DIR, e.g. "
+    "SHARD_COUNT=2 SHARD_SQLITE_DIR=/tmp/shards python manage.py test api",
+)
+class ShardingTests(TransactionTestCase):
+    """
+    End-to-end checks of per-user sharding on local SQLite shards.
+
+    TransactionTestCase because scatter() reads each shard on its own
+    thread and connection, which can't see a TestCase's open transaction.
+    """
+    databases = ALL_DATABASES
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw', role='ADMIN')
+        self.scheme = MutualFundScheme.objects.create(
+            name='Equity Fund', scheme_code='EQ1', description='', category='Equity',
+            nav=Decimal('12.3456'),
+        )
+        # Two customers whose home shards differ.
+        self.customers = []
+        homes = set()
+        for i in range(50):
+            user = User.objects.create_user(username=f'c{i}', password='pw', role='CUSTOMER')
+            if shard_for_user(user.pk) in homes:
+                user.delete()
+                continue
+            homes.add(shard_for_user(user.pk))
+            BankAccount.objects.create(
+                user=user, account_number=f'AC{i}', ifsc_code='IFSC0000001',
+                bank_name='Bank', balance=Decimal('10000.00'),
+            )
+            self.customers.append(user)
+            if len(self.customers) == 2:
+                break
+
+    def buy(self, user, amount='1000.00'):
+        response = api_client(user).post(
+            '/api/mutual-funds/purchase/',
+            {'scheme_id': self.scheme.pk, 'amount': amount}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_users_and_schemes_are_replicated(self):
+        for user in self.customers:
+            home = shard_for_user(user.pk)
+            for alias in settings.SHARD_DATABASES:
+                self.assertEqual(
+                    User.objects.using(alias).filter(pk=user.pk).exists(), alias == home
+                )
+        for alias in settings.SHARD_DATABASES:
+            self.assertEqual(MutualFundScheme.objects.using(alias).get().nav, self.scheme.nav)
+
+        self.scheme.nav = Decimal('13.0000')
+        self.scheme.save()
+        for alias in settings.SHARD_DATABASES:
+            self.assertEqual(MutualFundScheme.objects.using(alias).get().nav, Decimal('13.0000'))
+
+    def test_purchase_writes_to_the_home_shard(self):
+        user = self.customers[0]
+        self.buy(user)
+        home = shard_for_user(user.pk)
+        for alias in ALL_DATABASES:
+            self.assertEqual(
+                MFTransaction.objects.using(alias).filter(user_id=user.pk).count(),
+                1 if alias == home else 0,
+            )
+        account = BankAccount.objects.for_user(user).get()
+        self.assertEqual(account._state.db, home)
+        self.assertEqual(account.balance, Decimal('9000.00'))
+        self.assertEqual(Portfolio.objects.for_user(user).get().invested_amount, Decimal('1000.00'))
+
+    def test_delta_sync_across_shards(self):
+        for user in self.customers:
+            client = api_client(user)
+            response = client.get('/api/portfolio/')
+            version = response['X-Change-Version']
+            self.assertEqual(response.json(), [])
+
+            self.buy(user)
+            response = client.get(f'/api/portfolio/?since={version}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['scheme'] for row in response.json()], [self.scheme.pk])
+
+            response = client.get(f"/api/portfolio/?since={response['X-Change-Version']}")
+            self.assertEqual(response.status_code, 304)
+
+    def test_admin_totals_and_lists_gather_every_shard(self):
+        self.buy(self.customers[0], '1000.00')
+        self.buy(self.customers[1], '500.00')
+        admin = api_client(self.admin)
+
+        totals = admin.get('/api/portfolio/totals/').json()
+        self.assertEqual(totals['holdings'], 2)
+        self.assertEqual(totals['investors'], 2)
+        self.assertEqual(totals['total_invested'], 1500.0)
+
+        rows = admin.get('/api/transactions/').json()
+        self.assertEqual(sorted(row['user'] for row in rows), sorted(u.pk for u in self.customers))
+
+    def test_admin_detail_lookup_needs_user_when_ids_collide(self):
+        for user in self.customers:
+            self.buy(user)
+        # Each shard numbers its own rows, so both holdings are id 1.
+        ids = {Portfolio.objects.for_user(user).get().pk for user in self.customers}
+        self.assertEqual(len(ids), 1)
+        pk = ids.pop()
+        admin = api_client(self.admin)
+
+        self.assertEqual(admin.get(f'/api/portfolio/{pk}/').status_code, 400)
+        for user in self.customers:
+            response = admin.get(f'/api/portfolio/{pk}/?user={user.pk}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['user'], user.pk)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_django_admin_browses_each_shard(self):
+        for user in self.customers:
+            self.buy(user)
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+
+        for user in self.customers:
+            home = shard_for_user(user.pk)
+            response = self.client.get(f'/admin/api/portfolio/?shard={home}')
+            self.assertContains(response, user.username)
+            portfolio = Portfolio.objects.for_user(user).get()
+            response = self.client.get(
+                f'/admin/api/portfolio/{portfolio.pk}/change/?_changelist_filters=shard%3D{home}'
+            )
+            self.assertContains(response, f'value="{user.pk}" selected')
+
+
+def _fail():
+    raise RuntimeError('boom')
+
+
+TEST_HANDLERS = {
+    'test_echo': lambda **payload: payload,
+    'test_fail': lambda **payload: _fail(),
+    'test_unserialisable': lambda **payload: {'value': object()},
+}
+
+
+@override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=30, JOB_LOCK_TIMEOUT=300)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        patches = [
+            mock.patch.dict(jobs.HANDLERS, TEST_HANDLERS),
+            # work() installs SIGINT/SIGTERM handlers; keep the runner's.
+            mock.patch('api.jobs.signal.signal'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_claim_takes_the_most_urgent_due_job(self):
+        low = jobs.enqueue('test_echo', {'n': 1})
+        high = jobs.enqueue('test_echo', {'n': 2}, priority=5)
+        jobs.enqueue('test_echo', {'n': 3}, priority=9, delay=60)
+
+        job = jobs.claim('w1')
+        self.assertEqual(job.pk, high.pk)
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('RUNNING', 1, 'w1'))
+        self.assertEqual(jobs.claim('w2').pk, low.pk)
+        # The delayed job isn't due and everything else is taken.
+        self.assertIsNone(jobs.claim('w3'))
+
+    def test_burst_worker_runs_every_due_job(self):
+        for n in range(3):
+            jobs.enqueue('test_echo', {'n': n})
+
+        self.assertEqual(jobs.work(burst=True), 3)
+        self.assertEqual(
+            list(Job.objects.order_by('id').values_list('status', 'result')),
+            [('SUCCEEDED', {'n': n}) for n in range(3)],
+        )
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue('test_fail')
+        for attempt in range(1, 4):
+            before = timezone.now()
+            self.assertEqual(jobs.work(burst=True), 1)
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('RuntimeError: boom', job.error)
+            if attempt < 3:
+                self.assertEqual(job.status, 'QUEUED')
+                delay = (job.run_at - before).total_seconds()
+                self.assertAlmostEqual(delay, 30 * 2 ** (attempt - 1), delta=5)
+                Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(jobs.work(burst=True), 0)
+
+    def test_unrecordable_result_counts_as_a_failed_attempt(self):
+        bad = jobs.enqueue('test_unserialisable')
+        good = jobs.enqueue('test_echo', {'ok': True})
+
+        # The worker survives the bad job and goes on to the next one.
+        self.assertEqual(jobs.work(burst=True), 2)
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts, bad.locked_by), ('QUEUED', 1, ''))
+        self.assertIn('TypeError', bad.error)
+        self.assertEqual(Job.objects.get(pk=good.pk).status, 'SUCCEEDED')
+
+    def test_requeue_stale_only_takes_abandoned_jobs(self):
+        abandoned = jobs.enqueue('test_echo')
+        alive = jobs.enqueue('test_echo')
+        jobs.claim('dead-worker')
+        jobs.claim('live-worker')
+        Job.objects.filter(pk=abandoned.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+
+        jobs.requeue_stale()
+
+        abandoned.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((abandoned.status, abandoned.locked_by), ('QUEUED', ''))
+        self.assertIn('dead-worker stopped responding', abandoned.error)
+        self.assertEqual((alive.status, alive.locked_by), ('RUNNING', 'live-worker'))
+
+    def test_outcome_is_dropped_once_the_lock_is_lost(self):
+        jobs.enqueue('test_echo', {'n': 1})
+        job = jobs.claim('w1')
+        # Requeued and picked up by another worker while w1 was running.
+        Job.objects.filter(pk=job.pk).update(locked_by='w2', attempts=2)
+
+        self.assertFalse(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.result), ('RUNNING', 'w2', None))
+
+
+class GroupStreamTests(SimpleTestCase):
+
+    def test_take_merges_in_user_order(self):
+        stream = _GroupStream(iter([(1, 'a'), (1, 'b'), (3, 'c'), (5, 'd')]))
+        self.assertEqual(stream.take(1), [('a',), ('b',)])
+        self.assertEqual(stream.take(2), [])
+        # User 3 has no statement row, so its group is skipped.
+        self.assertEqual(stream.take(4), [])
+        self.assertEqual(stream.take(5), [('d',)])
+        self.assertEqual(stream.take(6), [])
+
+
+class InlinePool:
+    """Stands in for process_pool(): spawned workers can't see the test database."""
+
+    def __init__(self, workers):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class StatementTests(TestCase):
+    databases = ALL_DATABASES
+
+    def setUp(self):
+        self.scheme = MutualFundScheme.objects.create(
+            name='Equity Fund', scheme_code='EQ1', description='', category='Equity',
+            nav=Decimal('10.0000'),
+        )
+        NAVSnapshot.objects.create(scheme=self.scheme, date=date(2026, 1, 15), nav=Decimal('8.0000'))
+        NAVSnapshot.objects.create(scheme=self.scheme, date=date(2026, 2, 20), nav=Decimal('9.0000'))
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def customer(self, username):
+        return User.objects.create_user(username=username, password='pw', role='CUSTOMER')
+
+    def trade(self, user, scheme, txn_type, units, amount, day):
+        txn = MFTransaction.objects.create(
+            user=user, scheme=scheme, transaction_type=txn_type, units=Decimal(units),
+            nav_at_transaction=Decimal(amount) / Decimal(units), amount=Decimal(amount),
+        )
+        when = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        MFTransaction.objects.for_user(user).filter(pk=txn.pk).update(transaction_date=when)
+
+    def read(self, user, start, end):
+        path = os.path.join(
+            self.output_dir, f"{user.pk // 1000:06d}", f"{user.pk}_{start}_{end}.csv"
+        )
+        with open(path, newline='') as f:
+            return list(csv.reader(f))
+
+    def test_holdings_are_valued_as_of_the_period_end(self):
+        user = self.customer('c1')
+        unpriced = MutualFundScheme.objects.create(
+            name='New Debt Fund', scheme_code='D1', description='', category='Debt',
+            nav=Decimal('20.0000'),
+        )
+        self.trade(user, self.scheme, 'BUY', '10.0000', '80.00', date(2026, 1, 10))
+        self.trade(user, unpriced, 'BUY', '1.0000', '20.00', date(2026, 1, 12))
+        # After the period: must not show up in January's holdings.
+        self.trade(user, self.scheme, 'SELL', '4.0000', '36.00', date(2026, 2, 25))
+        Portfolio.objects.create(user=user, scheme=self.scheme, units=Decimal('6.0000'),
+                                 invested_amount=Decimal('44.00'))
+
+        start, end = date(2026, 1, 1), date(2026, 1, 31)
+        self.assertEqual(
+            render_range(user.pk, user.pk + 1, self.output_dir, 'csv', start, end,
+                         shard_for_user(user.pk)),
+            1,
+        )
+        rows = self.read(user, start, end)
+        self.assertIn(['Holdings', 'as of 2026-01-31'], rows)
+        self.assertIn(
+            ['Equity Fund', 'EQ1', '10.0000', '8.0000', '2026-01-15', '80.00', '80.00', '0.00'], rows
+        )
+        # No NAV history by the period end: priced at the current, dated NAV.
+        self.assertIn(
+            ['New Debt Fund', 'D1', '1.0000', '20.0000', timezone.localdate().isoformat(),
+             '20.00', '20.00', '0.00'],
+            rows,
+        )
+        self.assertNotIn('SELL', [row[1] for row in rows if len(row) > 1])
+
+    def test_rerun_resumes_from_the_checkpoint(self):
+        users = [self.customer(f'c{i}') for i in range(3)]
+        for user in users:
+            self.trade(user, self.scheme, 'BUY', '1.0000', '8.00', date(2026, 1, 10))
+        start, end = date(2026, 1, 1), date(2026, 1, 31)
+        ranges = len(user_ranges(1)) * len(shard_aliases())
+
+        with mock.patch('api.statements.process_pool', InlinePool):
+            self.assertEqual(generate_statements(self.output_dir, start, end, chunk_size=1),
+                             (3, 0))
+
+            # Interrupt the run after every range but the last customer's.
+            checkpoint = os.path.join(self.output_dir, f'.checkpoint_{start}_{end}_csv.jsonl')
+            with open(checkpoint) as f:
+                entries = f.readlines()
+            self.assertEqual(len(entries), ranges)
+            last = users[-1]
+            home = shard_for_user(last.pk)
+            with open(checkpoint, 'w') as f:
+                f.writelines(
+                    line for line in entries
+                    if f'"lo": {last.pk},' not in line or f'"shard": "{home}"' not in line
+                )
+            os.remove(os.path.join(self.output_dir, f"{last.pk // 1000:06d}",
+                                   f"{last.pk}_{start}_{end}.csv"))
+
+            self.assertEqual(generate_statements(self.output_dir, start, end, chunk_size=1),
+                             (1, ranges - 1))
+            self.assertIn(['Equity Fund', 'EQ1', '1.0000', '8.0000', '2026-01-15',
+                           '8.00', '8.00', '0.00'], self.read(last, start, end))
+            self.assertEqual(generate_statements(self.output_dir, start, end, chunk_size=1),
+                             (0, ranges))
+
+
+class CustomerImportTests(TestCase):
+    databases = ALL_DATABASES
+
+    def setUp(self):
+        patch = mock.patch('api.onboarding.process_pool', InlinePool)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def run_import(self, *rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['username', 'email', 'first_name', 'last_name',
+                             'account_number', 'ifsc_code', 'bank_name'])
+            for username, account in rows:
+                writer.writerow([username, f'{username}@example.com', 'F', 'L',
+                                 account, 'IFSC0000001', 'Bank'])
+        self.addCleanup(os.remove, f.name)
+        # One row per chunk, so each row is checked while the previous one
+        # is still waiting to be written.
+        report, errors = import_customers(f.name, chunk_size=1)
+        return report, [(error['line'], error['error']) for error in errors]
+
+    def test_duplicates_of_a_pending_chunk_are_rejected_once_it_is_saved(self):
+        report, errors = self.run_import(('alice', 'AC1'), ('alice', 'AC2'), ('bob', 'AC1'))
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(errors, [
+            (3, "A user with that username already exists."),
+            (4, "That account number is already linked."),
+        ])
+
+    def test_values_of_a_failed_chunk_can_be_reused(self):
+        write = _Importer._write
+        calls = []
+
+        def flaky_write(importer, ready):
+            calls.append(ready)
+            if len(calls) == 1:
+                raise DatabaseError('deadlock detected')
+            return write(importer, ready)
+
+        with mock.patch.object(_Importer, '_write', flaky_write):
+            report, errors = self.run_import(('alice', 'AC1'), ('alice', 'AC1'))
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(errors, [(2, "Chunk not saved: deadlock detected")])
+        self.assertTrue(User.objects.filter(username='alice').exists())
+
+
+class MarkToMarketTests(TestCase):
+    """Runs the SQL fixed-point casts and the upsert against a real database."""
+    databases = ALL_DATABASES
+
+    def setUp(self):
+        schemes = {
+            code: MutualFundScheme.objects.create(
+                name=code, scheme_code=code, description='', category='Equity', nav=Decimal(nav),
+            )
+            for code, nav in [('MAX', '999999.9999'), ('ODD', '12.3456'), ('MIN', '0.0001')]
+        }
+        users = [User.objects.create_user(username=f'c{i}', password='pw', role='CUSTOMER')
+                 for i in range(3)]
+        # The largest NAV, a product that floats round badly (81.0005 units),
+        # zero and sub-paisa holdings, and losses.
+        holdings = [
+            (users[0], 'MAX', '0.0001', '0.01'),
+            (users[0], 'ODD', '81.0005', '1000.00'),
+            (users[0], 'MIN', '0.0001', '0.01'),
+            (users[1], 'MAX', '0.0000', '0.00'),
+            (users[1], 'ODD', '0.0001', '12345.67'),
+        ]
+        if connection.vendor != 'sqlite':
+            # SQLite keeps decimals to ~15 significant digits, too few for
+            # full-width values at 8 decimal places.
+            holdings += [
+                (users[1], 'MIN', '99999999.9999', '9999999999.99'),
+                (users[2], 'MAX', '99999999.9999', '9999999999.99'),
+            ]
+        for user, code, units, invested in holdings:
+            Portfolio.objects.create(user=user, scheme=schemes[code],
+                                     units=Decimal(units), invested_amount=Decimal(invested))
+        self.schemes = schemes
+        self.count = len(holdings)
+
+    def test_valuations_match_decimal_arithmetic(self):
+        self.assertEqual(mark_to_market(chunk_size=2), self.count)
+        self.assertEqual(verify_valuations(), (self.count, []))
+
+    def test_rerun_updates_existing_valuations(self):
+        mark_to_market()
+        scheme = self.schemes['ODD']
+        scheme.nav = Decimal('13.0001')
+        scheme.save()
+
+        self.assertEqual(mark_to_market(), self.count)
+        self.assertEqual(verify_valuations(), (self.count, []))
+        navs = set()
+        for alias in shard_aliases():
+            navs.update(HoldingValuation.objects.using(alias).filter(scheme_id=scheme.pk)
+                        .values_list('nav', flat=True))
+        self.assertEqual(navs, {Decimal('13.0001')})
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse '<tokens>/<period>[:<burst>]' into (capacity, refill_per_second).
+
+    '10/min' refills 10 tokens a minute into a bucket of 10; '10/min:30'
+    refills at the same speed but lets a client burst up to 30.
+    """
+    if rate is None:
+        return None
+    rate, _, burst = rate.partition(':')
+    num, period = rate.split('/')
+    tokens = int(num)
+    capacity = int(burst) if burst else tokens
+    return capacity, tokens / PERIODS[period]
+
+
+def _refill(tokens, last, capacity, refill_rate, now):
+    return min(capacity, tokens + (now - last) * refill_rate)
+
+
+class MemoryBucketStore:
+    """
+    Buckets held in this process; exact, lock-protected, not shared.
+
+    At most max_keys buckets are kept, least recently used first out, so a
+    client cycling through identities can't grow memory and each request
+    stays O(1). Dropping a bucket only ever resets it to full.
+    """
+    max_keys = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, key, capacity, refill_rate, now):
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, last, capacity, refill_rate, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, _wait(tokens, refill_rate)
+
+
+class CacheBucketStore:
+    """
+    Buckets kept in the Django cache so every worker shares one limit.
+
+    The read-modify-write is not atomic across processes, so a burst racing
+    on the same key can slip a few extra requests through; that trade-off
+    keeps it to one cache round trip each way.
+    """
+
+    def consume(self, key, capacity, refill_rate, now):
+        tokens, last = cache.get(key, (capacity, now))
+        tokens = _refill(tokens, last, capacity, refill_rate, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(key, (tokens, now), int(capacity / refill_rate) + 1)
+        return allowed, _wait(tokens, refill_rate)
+
+
+def _wait(tokens, refill_rate):
+    return 0 if tokens >= 1 else (1 - tokens) / refill_rate
+
+
+_memory_store = MemoryBucketStore()
+_cache_store = CacheBucketStore()
+
+
+def get_store():
+    if settings.THROTTLE_BACKEND == 'cache':
+        return _cache_store
+    return _memory_store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle configured per scope and per role.
+
+    Rates come from settings.TOKEN_BUCKET_RATES[scope][role], where role is
+    the user's role or 'ANON'. Authenticated users get a bucket per user id,
+    anonymous clients one per IP address as resolved by DRF's get_ident()
+    under REST_FRAMEWORK['NUM_PROXIES']. A missing rate means unthrottled.
+    """
+    scope = None
+    timer = time.time
+
+    def get_rate(self, request):
+        rates = settings.TOKEN_BUCKET_RATES.get(self.scope, {})
+        role = request.user.role if request.user and request.user.is_authenticated else 'ANON'
+        return rates.get(role)
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"throttle:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        rate = parse_rate(self.get_rate(request))
+        if rate is None:
+            return True
+
+        capacity, refill_rate = rate
+        allowed, self._wait = get_store().consume(
+            self.get_cache_key(request), capacity, refill_rate, self.timer()
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class PurchaseThrottle(TokenBucketThrottle):
+    scope = 'purchase'
+
+
+class LoginThrottle(TokenBucketThrottle):
+    scope = 'login'
+
+
+class RegisterThrottle(TokenBucketThrottle):
+    scope = 'register'
+
+
+class ProjectionThrottle(TokenBucketThrottle):
+    scope = 'projection'
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 router = DefaultRouter()
@@ -9,13 +9,17 @@ router.register(r'bank-accounts', views.BankAccountViewSet, basename='bankaccoun
 router.register(r'mutual-funds', views.MutualFundSchemeViewSet, basename='mutualfund')
 router.register(r'transactions', views.MFTransactionViewSet, basename='transaction')
 router.register(r'portfolio', views.PortfolioViewSet, basename='portfolio')
+router.register(r'jobs', views.JobViewSet, basename='job')
 
 urlpatterns = [
     path('auth/register/', views.register, name='register'),
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/login/', views.LoginView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/me/', views.get_current_user, name='current_user'),
     path('mutual-funds/purchase/', views.purchase_mutual_fund, name='purchase_mutual_fund'),
+    path('events/ticket/', views.event_ticket, name='event_ticket'),
+    path('events/stream/', views.event_stream, name='event_stream'),
+    path('dashboard/', views.dashboard, name='dashboard'),
     path('', include(router.urls)),
 ]
 
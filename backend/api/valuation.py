@@ -0,0 +1,159 @@
+"""
+Full-book mark-to-market in int64 fixed point.
+
+Units and NAVs have 4 decimal places and amounts 2, so they are loaded as
+integers scaled by 10^4 and 10^2. Their product is exact at 10^-8, which is
+what Portfolio.current_value() returns in Decimal. A full-width product can
+exceed int64 (units up to 10^12, NAV up to 10^10 once scaled), so values
+are kept as two limbs: whole rupees and a 10^-8 fraction.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .models import HoldingValuation, MutualFundScheme, Portfolio
+from .sharding import shard_aliases
+
+FRACTION = 10 ** 8     # one rupee in value units (10^-4 units * 10^-4 NAV)
+NAV_SPLIT = 10 ** 5    # keeps each partial product of units * NAV below 10^17
+
+
+def _fixed(field, places):
+    # Round before casting: SQLite stores decimals as floats, where
+    # 81.0005 * 10^4 can land on 810004.99999.
+    return Cast(Round(F(field) * 10 ** places), output_field=BigIntegerField())
+
+
+def load_navs():
+    """Return (sorted scheme ids, NAVs scaled by 10^4) as int64 arrays."""
+    rows = list(
+        MutualFundScheme.objects.order_by('id')
+        .annotate(nav_fixed=_fixed('nav', 4))
+        .values_list('id', 'nav_fixed')
+    )
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    navs = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    return ids, navs
+
+
+def value_holdings(units, navs, invested):
+    """
+    Vectorised value and P/L for int64 fixed-point arrays.
+
+    units and navs are scaled by 10^4, invested by 10^2. Returns
+    (value_whole, value_frac, pl_whole, pl_frac) where each amount is
+    whole + frac / 10^8 and frac is always in [0, 10^8).
+    """
+    nav_hi, nav_lo = np.divmod(navs, NAV_SPLIT)
+    a = units * nav_hi          # < 10^17
+    b = units * nav_lo          # < 10^17
+
+    # value = a * 10^5 + b, regrouped around 10^8 so nothing overflows.
+    a_q, a_r = np.divmod(a, 1000)
+    carry, value_frac = np.divmod(a_r * NAV_SPLIT + b, FRACTION)
+    value_whole = a_q + carry
+
+    invested_whole, invested_cents = np.divmod(invested, 100)
+    # floor divmod keeps the fraction non-negative when P/L is a loss.
+    borrow, pl_frac = np.divmod(value_frac - invested_cents * (FRACTION // 100), FRACTION)
+    pl_whole = value_whole - invested_whole + borrow
+
+    return value_whole, value_frac, pl_whole, pl_frac
+
+
+def _to_decimal(whole, frac):
+    return Decimal(int(whole)) + Decimal(int(frac)).scaleb(-8)
+
+
+def mark_to_market(chunk_size=50000):
+    """
+    Revalue every holding at current NAVs and upsert HoldingValuation rows.
+
+    Portfolios are read in id-ordered chunks with units and amounts cast to
+    integers in SQL, valued with NumPy, and bulk-upserted one chunk per
+    transaction, shard by shard. Returns the number of holdings valued.
+    """
+    scheme_ids, scheme_navs = load_navs()
+    valued_at = timezone.now()
+    return sum(
+        _mark_shard(alias, scheme_ids, scheme_navs, valued_at, chunk_size)
+        for alias in shard_aliases()
+    )
+
+
+def _mark_shard(using, scheme_ids, scheme_navs, valued_at, chunk_size):
+    valued = 0
+    last_id = 0
+
+    while True:
+        rows = list(
+            Portfolio.objects.using(using).filter(id__gt=last_id)
+            .order_by('id')
+            .annotate(units_fixed=_fixed('units', 4), invested_fixed=_fixed('invested_amount', 2))
+            .values_list('id', 'user_id', 'scheme_id', 'units_fixed', 'invested_fixed')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        ids, user_ids, schemes, units, invested = (np.array(col, dtype=np.int64) for col in zip(*rows))
+        navs = scheme_navs[np.searchsorted(scheme_ids, schemes)]
+        value_whole, value_frac, pl_whole, pl_frac = value_holdings(units, navs, invested)
+
+        valuations = [
+            HoldingValuation(
+                portfolio_id=int(ids[i]),
+                user_id=int(user_ids[i]),
+                scheme_id=int(schemes[i]),
+                units=Decimal(int(units[i])).scaleb(-4),
+                nav=Decimal(int(navs[i])).scaleb(-4),
+                current_value=_to_decimal(value_whole[i], value_frac[i]),
+                profit_loss=_to_decimal(pl_whole[i], pl_frac[i]),
+                valued_at=valued_at,
+            )
+            for i in range(len(rows))
+        ]
+        with transaction.atomic(using=using):
+            HoldingValuation.objects.using(using).bulk_create(
+                valuations,
+                batch_size=5000,
+                update_conflicts=True,
+                unique_fields=['portfolio'],
+                update_fields=['units', 'nav', 'current_value', 'profit_loss', 'valued_at'],
+            )
+        valued += len(valuations)
+
+    return valued
+
+
+def verify_valuations():
+    """
+    Compare stored valuations with Portfolio.current_value()/profit_loss().
+
+    Returns (checked, mismatches) where mismatches lists the (shard,
+    portfolio id) pairs whose fixed-point result differs from the Decimal
+    one. Holdings whose units or NAV moved since the run are stale rather
+    than wrong, so they're skipped.
+    """
+    checked = 0
+    mismatches = []
+    for alias in shard_aliases():
+        rows = (
+            HoldingValuation.objects.using(alias)
+            .select_related('portfolio__scheme')
+            .order_by('portfolio_id')
+            .iterator(chunk_size=5000)
+        )
+        for valuation in rows:
+            portfolio = valuation.portfolio
+            if valuation.units != portfolio.units or valuation.nav != portfolio.scheme.nav:
+                continue
+            checked += 1
+            if (valuation.current_value != portfolio.current_value()
+                    or valuation.profit_loss != portfolio.profit_loss()):
+                mismatches.append((alias, portfolio.id))
+    return checked, mismatches
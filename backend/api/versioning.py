@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from .models import Portfolio
+from .sharding import shard_aliases
+
+User = get_user_model()
+
+BUMP_BATCH_SIZE = 1000
+
+
+def bump_user_version(user_id):
+    """
+    Increment one user's change version and return the new value.
+
+    Call inside the transaction that writes the user's rows, then stamp
+    those rows with the returned version.
+    """
+    User.objects.filter(pk=user_id).update(change_version=F('change_version') + 1)
+    return User.objects.filter(pk=user_id).values_list('change_version', flat=True).get()
+
+
+def bump_user_versions(user_ids):
+    """
+    Lock and increment several users' change versions; returns
+    {user_id: new_version}. Call inside the transaction that writes their
+    rows. Users are locked in id order so concurrent callers can't deadlock.
+    """
+    versions = dict(
+        User.objects.select_for_update()
+        .filter(id__in=user_ids)
+        .order_by('id')
+        .values_list('id', 'change_version')
+    )
+    User.objects.filter(id__in=versions).update(change_version=F('change_version') + 1)
+    return {user_id: version + 1 for user_id, version in versions.items()}
+
+
+def bump_scheme_holders(scheme_id):
+    """
+    After a NAV change, bump every holder of the scheme and re-stamp their
+    portfolio rows for it, since those rows' current value has changed.
+
+    Versions live on 'default' and holdings may live on a shard, so holders
+    are locked on 'default' first, their rows stamped with the next version,
+    and only then is the version itself advanced.
+
+    Runs as the 'bump_scheme_holders' job (see navs.set_nav), never inside
+    a request: holdings are paged by id and each batch of BUMP_BATCH_SIZE
+    commits on its own. Returns the number of holdings re-stamped.
+    """
+    bumped = 0
+    for alias in shard_aliases():
+        last_id = 0
+        while True:
+            holdings = list(
+                Portfolio.objects.using(alias)
+                .filter(scheme_id=scheme_id, id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'user_id')[:BUMP_BATCH_SIZE]
+            )
+            if not holdings:
+                break
+            last_id = holdings[-1][0]
+            _bump_batch(alias, holdings)
+            bumped += len(holdings)
+    return bumped
+
+
+def _bump_batch(alias, holdings):
+    user_ids = sorted({user_id for _id, user_id in holdings})
+    with transaction.atomic(), transaction.atomic(using=alias):
+        # Lock holders in id order so concurrent NAV updates can't deadlock.
+        versions = dict(
+            User.objects.select_for_update()
+            .filter(id__in=user_ids)
+            .order_by('id')
+            .values_list('id', 'change_version')
+        )
+        Portfolio.objects.using(alias).bulk_update(
+            [Portfolio(id=pk, version=versions[user_id] + 1) for pk, user_id in holdings],
+            ['version'],
+            batch_size=BUMP_BATCH_SIZE,
+        )
+        User.objects.filter(id__in=user_ids).update(change_version=F('change_version') + 1)
@@ -1,27 +1,54 @@
+import os
+import uuid
+
 from rest_framework import viewsets, status, generics
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (
+    action, api_view, permission_classes, authentication_classes, renderer_classes,
+    throttle_classes
+)
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Sum, F
+from django.conf import settings
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Sum, F, Count, DecimalField
+from django.http import StreamingHttpResponse, Http404
+from django.urls import reverse
 from decimal import Decimal, ROUND_DOWN
 
-from .models import BankAccount, MutualFundScheme, Portfolio, MFTransaction
+from .models import BankAccount, MutualFundScheme, Portfolio, MFTransaction, Job
 from .serializers import (
     UserRegistrationSerializer, UserSerializer, BankAccountSerializer,
     BankAccountUpdateSerializer, BalanceUpdateSerializer,
     MutualFundSchemeSerializer, NAVUpdateSerializer, MFTransactionSerializer,
-    MFPurchaseSerializer, PortfolioSerializer, UserPortfolioSerializer
+    MFPurchaseSerializer, PortfolioSerializer, UserPortfolioSerializer,
+    ProjectionRequestSerializer, JobSerializer, JobCreateSerializer
 )
 from .permissions import IsAdmin, IsCustomer, IsAdminOrReadOnly, IsOwnerOrAdmin
+from .projections import project_user
+from .authentication import StreamTicketAuthentication, issue_stream_ticket
+from .renderers import EventStreamRenderer
+from .throttling import PurchaseThrottle, LoginThrottle, RegisterThrottle, ProjectionThrottle
+from .versioning import bump_user_version
+from .navs import record_snapshot, set_nav
+from .jobs import enqueue
+from .sharding import is_sharded, scatter, shard_aliases, shard_for_user
+from .events import publish, stream_events
 
 User = get_user_model()
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterThrottle])
 def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
@@ -35,6 +62,10 @@ def register(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class LoginView(TokenObtainPairView):
+    throttle_classes = [LoginThrottle]
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_current_user(request):
@@ -47,10 +78,36 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAdmin]
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_customers(self, request):
+        # Bulk onboarding: store the uploaded CSV and import it in a
+        # background job; poll the returned job for the report.
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'Upload a CSV file.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+        name = f"{timezone.now():%Y%m%d%H%M%S}_{uuid.uuid4().hex[:8]}"
+        path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{name}.csv")
+        with open(path, 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+
+        job = enqueue(
+            'import_customers',
+            {'path': path, 'errors_path': os.path.join(settings.IMPORT_UPLOAD_DIR, f"{name}.errors.csv")},
+            created_by=request.user,
+        )
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(reverse('job-detail', args=[job.pk]))},
+        )
+
     @action(detail=True, methods=['get'])
     def portfolio(self, request, pk=None):
         user = self.get_object()
-        portfolios = Portfolio.objects.filter(user=user).select_related('scheme')
+        portfolios = Portfolio.objects.for_user(user).select_related('scheme')
 
         total_invested = portfolios.aggregate(
             total=Sum('invested_amount')
@@ -71,18 +128,56 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(data)
 
 
-class BankAccountViewSet(viewsets.ModelViewSet):
+class ShardedViewSetMixin:
+    """
+    For viewsets over sharded models, whose get_queryset() returns the
+    caller's rows via for_user(). When sharding is on, an admin's list is
+    gathered from every shard in parallel, and detail lookups search the
+    shards; ids are only unique per shard, so ?user=<id> picks one.
+    """
+
+    def _admin_scatter(self):
+        return is_sharded() and self.request.user.role == 'ADMIN'
+
+    def list(self, request, *args, **kwargs):
+        if not self._admin_scatter():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        per_shard = scatter(lambda alias: self.get_serializer(queryset.using(alias), many=True).data)
+        return Response([row for rows in per_shard for row in rows])
+
+    def get_object(self):
+        if not self._admin_scatter():
+            return super().get_object()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        user_id = self.request.query_params.get('user')
+        aliases = [shard_for_user(user_id)] if user_id else shard_aliases()
+
+        matches = [obj for alias in aliases for obj in queryset.using(alias).filter(**lookup)[:1]]
+        if not matches:
+            raise Http404
+        if len(matches) > 1:
+            raise ValidationError({'user': 'This id exists on several shards; pass ?user=<id>.'})
+        self.check_object_permissions(self.request, matches[0])
+        return matches[0]
+
+
+class BankAccountViewSet(ShardedViewSetMixin, viewsets.ModelViewSet):
     serializer_class = BankAccountSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         if self.request.user.role == 'ADMIN':
             return BankAccount.objects.all()
-        return BankAccount.objects.filter(user=self.request.user)
+        return BankAccount.objects.for_user(self.request.user)
 
     # --- Prevent Duplicate Account Creation ---
     def create(self, request, *args, **kwargs):
-        if BankAccount.objects.filter(user=request.user).exists():
+        if BankAccount.objects.for_user(request.user).exists():
             return Response(
                 {"error": "You already have a bank account linked. Please refresh the page."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -124,38 +219,133 @@ class MutualFundSchemeViewSet(viewsets.ModelViewSet):
     serializer_class = MutualFundSchemeSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    # ?ordering= values; prefix with '-' for descending.
+    ORDERING_FIELDS = {
+        'name': 'name',
+        'nav': 'nav',
+        'return_1y': 'metrics__return_1y',
+        'return_3y': 'metrics__return_3y',
+        'return_5y': 'metrics__return_5y',
+        'volatility': 'metrics__volatility_1y',
+        'max_drawdown': 'metrics__max_drawdown',
+    }
+    # Screener filters: query param -> lookup on the precomputed metrics.
+    METRIC_FILTERS = {
+        'min_return_1y': 'metrics__return_1y__gte',
+        'min_return_3y': 'metrics__return_3y__gte',
+        'min_return_5y': 'metrics__return_5y__gte',
+        'max_volatility': 'metrics__volatility_1y__lte',
+        # Drawdowns are stored as negative percentages; max_drawdown=20
+        # keeps schemes that never fell more than 20% from a peak.
+        'max_drawdown': 'metrics__max_drawdown__gte',
+    }
+
     def get_queryset(self):
-        queryset = MutualFundScheme.objects.all()
+        queryset = MutualFundScheme.objects.select_related('metrics')
         if self.request.user.role != 'ADMIN':
             queryset = queryset.filter(is_active=True)
+        if self.action != 'list':
+            return queryset
+
+        params = self.request.query_params
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category__iexact=category)
+
+        for param, lookup in self.METRIC_FILTERS.items():
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValidationError({param: 'Must be a number.'})
+            if param == 'max_drawdown':
+                value = -value
+            queryset = queryset.filter(**{lookup: value})
+
+        ordering = params.get('ordering')
+        if ordering:
+            field = self.ORDERING_FIELDS.get(ordering.lstrip('-'))
+            if field is None:
+                raise ValidationError({'ordering': f"Choose one of: {', '.join(self.ORDERING_FIELDS)}."})
+            # Schemes without enough history have null metrics; keep them last.
+            if ordering.startswith('-'):
+                queryset = queryset.order_by(F(field).desc(nulls_last=True), 'id')
+            else:
+                queryset = queryset.order_by(F(field).asc(nulls_last=True), 'id')
         return queryset
 
+    def perform_create(self, serializer):
+        record_snapshot(serializer.save())
+
+    def perform_update(self, serializer):
+        # Save everything but the NAV here; a NAV change goes through
+        # set_nav so it is snapshotted, queues the holder re-stamp and is published
+        # exactly like update_nav.
+        previous_nav = serializer.instance.nav
+        new_nav = serializer.validated_data.get('nav', previous_nav)
+        scheme = serializer.save(nav=previous_nav)
+        if new_nav != previous_nav:
+            set_nav(scheme, new_nav)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
     def update_nav(self, request, pk=None):
         scheme = self.get_object()
         serializer = NAVUpdateSerializer(data=request.data)
 
         if serializer.is_valid():
-            scheme.nav = serializer.validated_data['nav']
-            scheme.save()
+            set_nav(scheme, serializer.validated_data['nav'])
             return Response(MutualFundSchemeSerializer(scheme).data)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class MFTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class ChangesSinceMixin:
+    """
+    Delta sync for list endpoints: ?since=<version> returns only the caller's
+    rows stamped after that version, or an empty 304 if nothing changed.
+    Every list response carries the current version in X-Change-Version.
+    """
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        current = request.user.change_version
+
+        if since is None or request.user.role == 'ADMIN':
+            response = super().list(request, *args, **kwargs)
+        else:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({'error': 'since must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # request.user was just loaded by authentication, so an
+            # unchanged version costs no extra query at all.
+            if current <= since:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                queryset = self.filter_queryset(self.get_queryset()).filter(version__gt=since)
+                response = Response(self.get_serializer(queryset, many=True).data)
+
+        response['X-Change-Version'] = str(current)
+        return response
+
+
+class MFTransactionViewSet(ChangesSinceMixin, ShardedViewSetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = MFTransactionSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         if self.request.user.role == 'ADMIN':
             return MFTransaction.objects.all().select_related('user', 'scheme')
-        return MFTransaction.objects.filter(user=self.request.user).select_related('scheme')
+        return MFTransaction.objects.for_user(self.request.user).select_related('scheme')
 
 
 # --- FINAL FIXED PURCHASE FUNCTION ---
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([PurchaseThrottle])
 def purchase_mutual_fund(request):
     try:
         serializer = MFPurchaseSerializer(data=request.data)
@@ -166,12 +356,15 @@ def purchase_mutual_fund(request):
         scheme_id = serializer.validated_data['scheme_id']
         amount = serializer.validated_data['amount']
         user = request.user
+        shard = shard_for_user(user.id)
 
-        # Use atomic transaction block for safety
-        with transaction.atomic():
+        # Use atomic transaction block for safety. The user's rows live on
+        # their shard; the change version lives with the user on 'default'
+        # (both are the same database unless sharding is enabled).
+        with transaction.atomic(), transaction.atomic(using=shard):
             # 1. Lock Bank Account (Must be inside atomic block)
             try:
-                bank_account = BankAccount.objects.select_for_update().get(user=user)
+                bank_account = BankAccount.objects.for_user(user).select_for_update().get()
             except BankAccount.DoesNotExist:
                 return Response(
                     {'error': 'Bank account not found. Please add bank details first.'},
@@ -203,18 +396,20 @@ def purchase_mutual_fund(request):
             bank_account.balance -= Decimal(amount)
             bank_account.save()
 
-            # 6. Create Transaction
-            mf_transaction = MFTransaction.objects.create(
+            # 6. Create Transaction (stamped with the user's new change version)
+            version = bump_user_version(user.id)
+            mf_transaction = MFTransaction.objects.db_manager(shard).create(
                 user=user,
                 scheme=scheme,
                 transaction_type='BUY',
                 units=units,
                 nav_at_transaction=scheme.nav,
-                amount=amount
+                amount=amount,
+                version=version
             )
 
             # 7. Update Portfolio
-            portfolio, created = Portfolio.objects.get_or_create(
+            portfolio, created = Portfolio.objects.using(shard).get_or_create(
                 user=user,
                 scheme=scheme,
                 defaults={'units': Decimal('0.0000'), 'invested_amount': Decimal('0.00')}
@@ -222,8 +417,11 @@ def purchase_mutual_fund(request):
 
             portfolio.units += units
             portfolio.invested_amount += Decimal(amount)
+            portfolio.version = version
             portfolio.save()
 
+            publish('portfolio', user_id=user.id)
+
             return Response({
                 'message': 'Purchase successful!',
                 'units_allotted': float(units),
@@ -237,19 +435,53 @@ def purchase_mutual_fund(request):
         return Response({'error': f'An unexpected error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class PortfolioViewSet(viewsets.ReadOnlyModelViewSet):
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def event_ticket(request):
+    # EventSource can't send the Authorization header, so the browser
+    # trades its JWT for a short-lived ticket to put in the stream URL.
+    return Response({
+        'ticket': issue_stream_ticket(request.user),
+        'expires_in': settings.EVENT_TICKET_MAX_AGE,
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication, StreamTicketAuthentication])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def event_stream(request):
+    # Server-Sent Events: NAV changes and the caller's portfolio totals.
+    # Under WSGI Django would drain the whole async stream before sending
+    # anything while holding a worker, so refuse instead; see ASGI_APPLICATION.
+    if not isinstance(request._request, ASGIRequest):
+        return Response(
+            {'error': 'Live events need the ASGI server (uvicorn); this worker is WSGI.'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    response = StreamingHttpResponse(
+        stream_events(request.user.id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class PortfolioViewSet(ChangesSinceMixin, ShardedViewSetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PortfolioSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         if self.request.user.role == 'ADMIN':
             return Portfolio.objects.all().select_related('user', 'scheme')
-        return Portfolio.objects.filter(user=self.request.user).select_related('scheme')
+        return Portfolio.objects.for_user(self.request.user).select_related('scheme')
 
     @action(detail=False, methods=['get'])
     def summary(self, request):
         user = request.user
-        portfolios = Portfolio.objects.filter(user=user).select_related('scheme')
+        portfolios = Portfolio.objects.for_user(user).select_related('scheme')
 
         total_invested = portfolios.aggregate(
             total=Sum('invested_amount')
@@ -268,4 +500,138 @@ class PortfolioViewSet(viewsets.ReadOnlyModelViewSet):
         }
 
         # Do NOT pass data to UserPortfolioSerializer here
-        return Response(data)
\ No newline at end of file
+        return Response(data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdmin])
+    def totals(self, request):
+        # Book-wide totals, aggregated on every shard in parallel.
+        def shard_totals(alias):
+            return Portfolio.objects.using(alias).aggregate(
+                holdings=Count('id'),
+                investors=Count('user', distinct=True),
+                total_invested=Sum('invested_amount'),
+                total_current_value=Sum(
+                    F('units') * F('scheme__nav'),
+                    output_field=DecimalField(max_digits=24, decimal_places=8),
+                ),
+            )
+
+        per_shard = scatter(shard_totals)
+        total_invested = sum((t['total_invested'] or Decimal('0.00') for t in per_shard), Decimal('0.00'))
+        total_current_value = sum((t['total_current_value'] or Decimal('0.00') for t in per_shard), Decimal('0.00'))
+        return Response({
+            'holdings': sum(t['holdings'] for t in per_shard),
+            'investors': sum(t['investors'] for t in per_shard),
+            'total_invested': float(total_invested),
+            'total_current_value': float(total_current_value),
+            'total_profit_loss': float(total_current_value - total_invested),
+        })
+
+    @action(detail=False, methods=['get', 'post'], throttle_classes=[ProjectionThrottle])
+    def projection(self, request):
+        # GET takes years/paths as query params; POST can also override
+        # the per-category return/volatility assumptions.
+        params = request.data if request.method == 'POST' else request.query_params
+        serializer = ProjectionRequestSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+
+        data = project_user(
+            request.user,
+            years=serializer.validated_data['years'],
+            paths=serializer.validated_data['paths'],
+            assumption_overrides=serializer.validated_data.get('assumptions'),
+        )
+        return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard(request):
+    # Everything the customer Dashboard needs in one round trip and a fixed
+    # number of queries: bank account, portfolio totals, recent transactions.
+    user = request.user
+    try:
+        limit = min(max(int(request.query_params.get('transactions', 5)), 0), 50)
+    except ValueError:
+        return Response({'error': 'transactions must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # The bank account is always read fresh: balance and account edits don't
+    # bump change_version, so only the holdings-derived part is cached.
+    bank_account = BankAccount.objects.for_user(user).select_related('user').first()
+    data = {
+        'user': UserSerializer(user).data,
+        'bank_account': BankAccountSerializer(bank_account).data if bank_account else None,
+        **_dashboard_portfolio(user, limit),
+    }
+    return Response(data)
+
+
+def _dashboard_portfolio(user, limit):
+    """
+    Portfolio totals and recent transactions, cached per change_version.
+
+    Every purchase, repair and NAV change affecting the user bumps the
+    version, so a cached entry can never outlive the data it was built from.
+    """
+    cache_key = f"dashboard:{user.pk}:{user.change_version}:{limit}"
+    timeout = settings.DASHBOARD_CACHE_TIMEOUT
+    if timeout:
+        data = cache.get(cache_key)
+        if data is not None:
+            return data
+
+    totals = Portfolio.objects.for_user(user).aggregate(
+        total_invested=Sum('invested_amount'),
+        total_current_value=Sum(
+            F('units') * F('scheme__nav'),
+            output_field=DecimalField(max_digits=24, decimal_places=8),
+        ),
+        holdings=Count('id'),
+    )
+    total_invested = totals['total_invested'] or Decimal('0.00')
+    total_current_value = totals['total_current_value'] or Decimal('0.00')
+
+    transactions = MFTransaction.objects.for_user(user).select_related('user', 'scheme')[:limit]
+
+    data = {
+        'portfolio': {
+            'holdings': totals['holdings'],
+            'total_invested': float(total_invested),
+            'total_current_value': float(total_current_value),
+            'total_profit_loss': float(total_current_value - total_invested),
+        },
+        'recent_transactions': MFTransactionSerializer(transactions, many=True).data,
+    }
+
+    if timeout:
+        cache.set(cache_key, data, timeout)
+    return data
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Admins enqueue background work with POST and poll GET /jobs/<id>/
+    until the status is SUCCEEDED or FAILED. `manage.py runworker` runs them.
+    """
+    queryset = Job.objects.select_related('created_by')
+    serializer_class = JobSerializer
+    permission_classes = [IsAdmin]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for field in ('status', 'name'):
+            value = self.request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+    def create(self, request):
+        serializer = JobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job = enqueue(created_by=request.user, **serializer.validated_data)
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(f'{job.pk}/')},
+        )
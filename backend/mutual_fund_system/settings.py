@@ -54,6 +54,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mutual_fund_system.wsgi.application'
+# The live event stream (/api/events/stream/) only works under ASGI; WSGI
+# workers answer it with 501. Serve the API with:
+#   gunicorn mutual_fund_system.asgi:application -k uvicorn.workers.UvicornWorker
+ASGI_APPLICATION = 'mutual_fund_system.asgi.application'
 
 
 DATABASES = {
@@ -67,6 +71,31 @@ DATABASES = {
     }
 }
 
+# Opt-in hash sharding of per-user tables by user id (see api/sharding.py).
+# SHARD_COUNT=N adds databases shard0..shardN-1, named <DB_NAME>_shard<i> on
+# the same server unless SHARD_<i>_DB_NAME / SHARD_<i>_DB_HOST override it.
+# SHARD_SQLITE_DIR puts the shards in local SQLite files instead, for
+# testing. Run `manage.py migrate --database shard<i>` for every shard.
+SHARD_COUNT = config('SHARD_COUNT', default=0, cast=int)
+SHARD_SQLITE_DIR = config('SHARD_SQLITE_DIR', default='')
+SHARD_DATABASES = []
+for _i in range(SHARD_COUNT):
+    _alias = f'shard{_i}'
+    if SHARD_SQLITE_DIR:
+        DATABASES[_alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(Path(SHARD_SQLITE_DIR) / f'{_alias}.sqlite3'),
+        }
+    else:
+        DATABASES[_alias] = {
+            **DATABASES['default'],
+            'NAME': config(f'SHARD_{_i}_DB_NAME', default=f"{DATABASES['default']['NAME']}_{_alias}"),
+            'HOST': config(f'SHARD_{_i}_DB_HOST', default=DATABASES['default']['HOST']),
+        }
+    SHARD_DATABASES.append(_alias)
+
+DATABASE_ROUTERS = ['api.sharding.ShardRouter'] if SHARD_DATABASES else []
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -94,6 +123,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Reverse proxies in front of the app; the client IP used for anonymous
+    # throttling is taken that many hops from the right of X-Forwarded-For.
+    # 0 ignores the header (which clients can forge) and uses REMOTE_ADDR.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 SIMPLE_JWT = {
@@ -107,4 +140,95 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+CORS_EXPOSE_HEADERS = ['X-Change-Version']
+
+# Shared by every web worker and batch command: projection results, the
+# 'cache' throttle backend and the dashboard cache. Set REDIS_URL to use
+# Redis (needs the redis package); otherwise the django_cache table is used,
+# which migration 0008 creates. The table fallback counts its rows on every
+# write, so it suits small deployments; run Redis before turning on
+# THROTTLE_BACKEND='cache'. Its MAX_ENTRIES must exceed one projection per
+# customer plus the dashboard entries, or project_portfolios recomputes
+# whatever was culled; when full, 1/CACHE_CULL_FREQUENCY of it is dropped.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5_000_000, cast=int),
+                'CULL_FREQUENCY': config('CACHE_CULL_FREQUENCY', default=10, cast=int),
+            },
+        },
+    }
+
+# Monte Carlo portfolio projections (annualised, per scheme category).
+# Categories not listed here fall back to DEFAULT.
+PROJECTION_ASSUMPTIONS = {
+    'EQUITY': {'expected_return': 0.12, 'volatility': 0.18},
+    'DEBT': {'expected_return': 0.07, 'volatility': 0.04},
+    'HYBRID': {'expected_return': 0.10, 'volatility': 0.10},
+    'DEFAULT': {'expected_return': 0.08, 'volatility': 0.12},
+}
+PROJECTION_DEFAULT_PATHS = 10000
+PROJECTION_MAX_PATHS = 100000
+# Paths simulated per block; bounds memory at about 2 MB per 1000 paths
+# regardless of the requested path count.
+PROJECTION_BLOCK_PATHS = 5000
+PROJECTION_CACHE_TIMEOUT = config('PROJECTION_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+
+# Live event stream (SSE). 'memory' fans out inside one process; use
+# 'database' when running several worker processes so every process sees
+# every change through the change_events table.
+EVENT_BACKEND = config('EVENT_BACKEND', default='memory')
+EVENT_POLL_INTERVAL = config('EVENT_POLL_INTERVAL', default=1.0, cast=float)
+EVENT_RETENTION = 60 * 60
+# Ids are assigned at insert but become visible at commit, so a row can
+# appear below ids the poller has already passed. Each poll re-reads this
+# many ids behind the newest one seen and skips rows it already delivered.
+EVENT_REPLAY_WINDOW = 1000
+EVENT_KEEPALIVE = 15
+EVENT_RETRY_MS = 3000
+EVENT_STREAM_MAX_AGE = 10 * 60
+# Lifetime of the ticket EventSource puts in the stream URL in place of the
+# JWT; each (re)connect fetches a fresh one.
+EVENT_TICKET_MAX_AGE = 30
+
+# Token-bucket throttling per endpoint scope and role ('ANON' for
+# unauthenticated clients). Rates are '<tokens>/<period>[:<burst>]'.
+# 'memory' keeps buckets per process, so with N workers a client can get N
+# times the rate. THROTTLE_BACKEND='cache' shares buckets across workers
+# through CACHES, which is shared (Redis or the database cache) above.
+THROTTLE_BACKEND = config('THROTTLE_BACKEND', default='memory')
+TOKEN_BUCKET_RATES = {
+    'purchase': {'CUSTOMER': '10/min:20', 'ADMIN': '60/min'},
+    'login': {'ANON': '10/min'},
+    'register': {'ANON': '5/min', 'CUSTOMER': '5/min', 'ADMIN': '30/min'},
+    # Uncached projections cost a full simulation each.
+    'projection': {'CUSTOMER': '6/min:10', 'ADMIN': '30/min'},
+}
+
+# Seconds to cache the portfolio part of each user's /dashboard/ payload,
+# keyed by change_version; 0 disables caching.
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=0, cast=int)
+
+# Background jobs (jobs table, run by `manage.py runworker`). Failed jobs are
+# retried after JOB_RETRY_BACKOFF seconds, doubling each attempt. A running
+# job's lock is refreshed every JOB_HEARTBEAT_INTERVAL seconds; one whose
+# lock is older than JOB_LOCK_TIMEOUT has lost its worker and is requeued.
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 30
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=5 * 60, cast=int)
+
+# Uploaded customer import files and their error reports. Workers read from
+# here, so it must be shared storage when they run on other hosts.
+IMPORT_UPLOAD_DIR = config('IMPORT_UPLOAD_DIR', default=str(BASE_DIR / 'imports'))
\ No newline at end of file
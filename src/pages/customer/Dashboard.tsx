@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { bankAPI, portfolioAPI } from '../../services/api';
+import { dashboardAPI, openEventStream } from '../../services/api';
 import Navbar from '../../components/Navbar';
 import { Wallet, PieChart, TrendingUp, ShoppingCart, CreditCard } from 'lucide-react';
 
@@ -17,41 +17,31 @@ const Dashboard = () => {
     fetchDashboardData();
   }, []);
 
+  // Live portfolio totals pushed by the server on NAV changes and purchases
+  useEffect(() => {
+    const stream = openEventStream();
+    stream.addEventListener('portfolio', (event) => {
+      const totals = JSON.parse((event as MessageEvent).data);
+      setStats((prev) => ({
+        ...prev,
+        totalInvested: totals.total_invested,
+        currentValue: totals.total_current_value,
+        totalGainLoss: totals.total_profit_loss,
+      }));
+    });
+    return () => stream.close();
+  }, []);
+
   const fetchDashboardData = async () => {
     try {
-      const [bankRes, portfolioRes] = await Promise.all([
-        bankAPI.getMyAccount(),
-        portfolioAPI.getPortfolioSummary(),
-      ]);
-
-      console.log("Dashboard Bank Data:", bankRes.data);
-      console.log("Dashboard Portfolio Data:", portfolioRes.data);
-
-      let balance = 0;
-      const bData = bankRes.data;
-
-      if (Array.isArray(bData) && bData.length > 0) {
-        balance = parseFloat(bData[0].balance);
-      } else if (bData.results && Array.isArray(bData.results) && bData.results.length > 0) {
-        balance = parseFloat(bData.results[0].balance); // DRF Pagination handling
-      } else if (bData.balance) {
-        balance = parseFloat(bData.balance);
-      } else if (bData.data && bData.data.balance) {
-        balance = parseFloat(bData.data.balance);
-      }
-
-      // --- 3. PROCESS PORTFOLIO DATA ---
-      const pData = portfolioRes.data;
-      
-      const invested = parseFloat(pData.total_invested || 0);
-      const current = parseFloat(pData.total_current_value || 0);
-      const gainLoss = parseFloat(pData.total_profit_loss || 0);
+      // One round trip: user, bank balance, portfolio totals, recent transactions
+      const { data } = await dashboardAPI.get();
 
       setStats({
-        walletBalance: balance,
-        totalInvested: invested,
-        currentValue: current,
-        totalGainLoss: gainLoss,
+        walletBalance: parseFloat(data.bank_account?.balance || 0),
+        totalInvested: data.portfolio.total_invested,
+        currentValue: data.portfolio.total_current_value,
+        totalGainLoss: data.portfolio.total_profit_loss,
       });
 
     } catch (err) {
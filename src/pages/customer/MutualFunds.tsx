@@ -1,8 +1,16 @@
 import { useState, useEffect } from 'react';
-import { mutualFundAPI, bankAPI } from '../../services/api';
+import { mutualFundAPI, bankAPI, openEventStream } from '../../services/api';
 import Navbar from '../../components/Navbar';
 import { TrendingUp, ShoppingCart, Banknote } from 'lucide-react';
 
+interface SchemeMetrics {
+  return_1y: number | null;
+  return_3y: number | null;
+  return_5y: number | null;
+  volatility_1y: number | null;
+  max_drawdown: number | null;
+}
+
 interface MutualFund {
   id: number;
   name: string;
@@ -10,8 +18,21 @@ interface MutualFund {
   description: string;
   category: string;
   nav: string;
+  metrics: SchemeMetrics | null;
 }
 
+const SORT_OPTIONS = [
+  { value: '', label: 'Default' },
+  { value: '-return_1y', label: 'Highest 1Y return' },
+  { value: '-return_3y', label: 'Highest 3Y return' },
+  { value: '-return_5y', label: 'Highest 5Y return' },
+  { value: 'volatility', label: 'Lowest volatility' },
+  { value: '-max_drawdown', label: 'Smallest drawdown' },
+];
+
+const formatPercent = (value: number | null | undefined) =>
+  value === null || value === undefined ? '—' : `${value.toFixed(2)}%`;
+
 const MutualFunds = () => {
   const [schemes, setSchemes] = useState<MutualFund[]>([]);
   const [balance, setBalance] = useState(0);
@@ -20,25 +41,54 @@ const MutualFunds = () => {
   const [amount, setAmount] = useState('');
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
+  const [ordering, setOrdering] = useState('');
 
   useEffect(() => {
     fetchData();
   }, []);
 
+  useEffect(() => {
+    if (!loading) fetchSchemes();
+  }, [ordering]);
+
+  // Live NAV updates instead of re-fetching the scheme list
+  useEffect(() => {
+    const stream = openEventStream();
+    stream.addEventListener('nav', (event) => {
+      const { scheme_id, nav } = JSON.parse((event as MessageEvent).data);
+      setSchemes((prev) => prev.map((s) => (s.id === scheme_id ? { ...s, nav } : s)));
+    });
+    return () => stream.close();
+  }, []);
+
+  const schemeParams = () => (ordering ? { ordering } : undefined);
+
+  const setSchemesFrom = (sData: any) => {
+    // Smart Detection for Schemes
+    let schemesData: MutualFund[] = [];
+    if (Array.isArray(sData)) schemesData = sData;
+    else if (sData.results) schemesData = sData.results;
+    else if (sData.data) schemesData = sData.data;
+    setSchemes(schemesData || []);
+  };
+
+  const fetchSchemes = async () => {
+    try {
+      const schemesRes = await mutualFundAPI.getAllSchemes(schemeParams());
+      setSchemesFrom(schemesRes.data);
+    } catch (err) {
+      console.error("Error fetching schemes:", err);
+    }
+  };
+
   const fetchData = async () => {
     try {
       const [schemesRes, bankRes] = await Promise.all([
-        mutualFundAPI.getAllSchemes(),
+        mutualFundAPI.getAllSchemes(schemeParams()),
         bankAPI.getMyAccount(),
       ]);
 
-      // Smart Detection for Schemes
-      let schemesData: MutualFund[] = [];
-      const sData = schemesRes.data;
-      if (Array.isArray(sData)) schemesData = sData;
-      else if (sData.results) schemesData = sData.results;
-      else if (sData.data) schemesData = sData.data;
-      setSchemes(schemesData || []);
+      setSchemesFrom(schemesRes.data);
 
       // Smart Detection for Balance
       const bData = bankRes.data;
@@ -128,6 +178,20 @@ const MutualFunds = () => {
           </div>
         </div>
 
+        <div className="flex justify-end items-center gap-2 mb-4">
+          <label htmlFor="ordering" className="text-sm text-gray-600">Sort by</label>
+          <select
+            id="ordering"
+            value={ordering}
+            onChange={(e) => setOrdering(e.target.value)}
+            className="px-3 py-2 border border-gray-300 rounded-lg bg-white focus:outline-none focus:ring-2 focus:ring-blue-500"
+          >
+            {SORT_OPTIONS.map((option) => (
+              <option key={option.value} value={option.value}>{option.label}</option>
+            ))}
+          </select>
+        </div>
+
         {error && <div className="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">{error}</div>}
         {success && <div className="bg-green-100 border border-green-400 text-green-700 px-4 py-3 rounded mb-4">{success}</div>}
 
@@ -146,6 +210,20 @@ const MutualFunds = () => {
                 <div className="text-sm text-gray-600">Current NAV</div>
                 <div className="text-2xl font-bold text-blue-600">₹{parseFloat(scheme.nav).toFixed(4)}</div>
               </div>
+              <div className="grid grid-cols-3 gap-2 mb-4 text-center text-sm">
+                <div>
+                  <div className="text-gray-500">1Y</div>
+                  <div className="font-semibold">{formatPercent(scheme.metrics?.return_1y)}</div>
+                </div>
+                <div>
+                  <div className="text-gray-500">3Y</div>
+                  <div className="font-semibold">{formatPercent(scheme.metrics?.return_3y)}</div>
+                </div>
+                <div>
+                  <div className="text-gray-500">Volatility</div>
+                  <div className="font-semibold">{formatPercent(scheme.metrics?.volatility_1y)}</div>
+                </div>
+              </div>
               <button
                 onClick={() => setSelectedScheme(scheme)}
                 className="w-full bg-blue-600 text-white py-2 rounded-lg hover:bg-blue-700 flex items-center justify-center space-x-2"
@@ -43,6 +43,27 @@ api.interceptors.response.use(
   }
 );
 
+// Delta sync: keep the last copy of a list with its change version and
+// only ask the server for rows changed since then (304 when none did).
+const syncList = async (url: string) => {
+  const cacheKey = `sync:${url}`;
+  const cached = JSON.parse(localStorage.getItem(cacheKey) || 'null');
+  const res = await api.get(url, {
+    params: cached ? { since: cached.version } : {},
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+  if (res.status === 304) return { ...res, data: cached.rows };
+
+  let rows = res.data;
+  if (cached) {
+    const changedIds = new Set(rows.map((row: any) => row.id));
+    rows = [...rows, ...cached.rows.filter((row: any) => !changedIds.has(row.id))];
+  }
+  const version = res.headers['x-change-version'];
+  if (version) localStorage.setItem(cacheKey, JSON.stringify({ version, rows }));
+  return { ...res, data: rows };
+};
+
 export const authAPI = {
   register: (data: any) => api.post('/auth/register/', data),
   login: (username: string, password: string) => api.post('/auth/login/', { username, password }),
@@ -59,7 +80,7 @@ export const bankAPI = {
 };
 
 export const mutualFundAPI = {
-  getAllSchemes: () => api.get('/mutual-funds/'),
+  getAllSchemes: (params?: Record<string, string>) => api.get('/mutual-funds/', { params }),
   getScheme: (id: number) => api.get(`/mutual-funds/${id}/`),
   createScheme: (data: any) => api.post('/mutual-funds/', data),
   updateScheme: (id: number, data: any) => api.patch(`/mutual-funds/${id}/`, data),
@@ -70,12 +91,57 @@ export const mutualFundAPI = {
 };
 
 export const portfolioAPI = {
-  getMyPortfolio: () => api.get('/portfolio/'),
+  getMyPortfolio: () => syncList('/portfolio/'),
   getPortfolioSummary: () => api.get('/portfolio/summary/'),
 };
 
+export const dashboardAPI = {
+  get: (transactions = 5) => api.get('/dashboard/', { params: { transactions } }),
+};
+
 export const transactionAPI = {
-  getMyTransactions: () => api.get('/transactions/'),
+  getMyTransactions: () => syncList('/transactions/'),
+};
+
+// EventSource can't send headers, so each connection trades the JWT for a
+// short-lived stream ticket and puts that in the query string. Tickets
+// expire, so instead of the browser's own reconnect (which would reuse a
+// stale ticket) every dropped connection is reopened with a fresh one.
+export const openEventStream = () => {
+  const listeners: [string, (event: Event) => void][] = [];
+  let source: EventSource | null = null;
+  let closed = false;
+
+  const reconnect = () => {
+    if (!closed) setTimeout(connect, 3000);
+  };
+
+  const connect = async () => {
+    try {
+      const { data } = await api.post('/events/ticket/');
+      if (closed) return;
+      source = new EventSource(`${API_BASE_URL}/events/stream/?ticket=${encodeURIComponent(data.ticket)}`);
+      listeners.forEach(([type, listener]) => source?.addEventListener(type, listener));
+      source.onerror = () => {
+        source?.close();
+        reconnect();
+      };
+    } catch {
+      reconnect();
+    }
+  };
+  connect();
+
+  return {
+    addEventListener: (type: string, listener: (event: Event) => void) => {
+      listeners.push([type, listener]);
+      source?.addEventListener(type, listener);
+    },
+    close: () => {
+      closed = true;
+      source?.close();
+    },
+  };
 };
 
 export const userAPI = {